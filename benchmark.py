@@ -0,0 +1,102 @@
+'''
+Benchmarks for the AGGM Foundation module.
+
+Run all of them with `python benchmark.py`, or pick some by name, e.g. `python benchmark.py noise`.
+'''
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import foundation
+
+
+def timed(function, *args, **kwargs):
+    '''Returns the wall-clock seconds taken by one call'''
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_noise():
+    '''Compares ASCIIImageGenerator noise rendering with 1, 2, 4 and 8 worker processes'''
+    backends = ['python'] + (['numpy'] if foundation._numpy() is not None else [])
+    for backend in backends:
+        generator = foundation.ASCIIImageGenerator(backend=backend, seed=1)
+        for size in (256, 512, 1024):
+            for workers in (1, 2, 4, 8):
+                elapsed = timed(generator.perlin_noise, size, size, workers=workers)
+                print(f"noise {backend:6} {size}x{size} workers={workers}: {elapsed:.3f}s")
+
+
+def import_time(module='foundation'):
+    '''Returns the cumulative microseconds `python -X importtime` reports for importing module'''
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, env=env, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1])
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def bench_import(runs=10):
+    '''Measures the cost of `import foundation` in a fresh interpreter (bytecode cached after the first run)'''
+    import_time()
+    times = sorted(import_time() for _ in range(runs))
+    print(f"import foundation: min {times[0] / 1000:.1f}ms, median {statistics.median(times) / 1000:.1f}ms")
+
+
+def bench_passwords(n=200000, length=16):
+    '''Measures generate_passwords throughput with and without a policy, and with 1, 2 and 4 worker processes'''
+    for policy in (None, {'digits': 2, 'symbols': 2, 'upper': 1}):
+        for workers in (1, 2, 4):
+            elapsed = timed(foundation.generate_passwords, n, length, policy, workers)
+            label = 'policy' if policy else 'plain'
+            print(f"passwords {label:6} length={length} workers={workers}: {n / elapsed:,.0f}/s")
+
+
+def bench_secret(n=1_000_000):
+    '''Compares Secret per-value and bulk draws with random.SystemRandom, which reads os.urandom per value'''
+    import random
+    secret = foundation.Secret()
+    system = random.SystemRandom()
+    cases = [
+        ('Secret.random()', secret.random),
+        ('SystemRandom.random()', system.random),
+        ('Secret.roll(6)', lambda: secret.roll(6)),
+        ('SystemRandom.randint(1, 6)', lambda: system.randint(1, 6)),
+    ]
+    for label, function in cases:
+        elapsed = timed(lambda: [function() for _ in range(n)])
+        print(f"{label:28} {elapsed / n * 1e6:.3f}us/value")
+    elapsed = timed(secret.numbers, 1, 6, n)
+    print(f"{'Secret.numbers(1, 6, n)':28} {elapsed / n * 1e6:.3f}us/value")
+
+
+def bench_markov(n=1_000_000, order=2):
+    '''Times MarkovModel.fit on a Zipf-like corpus of n words with 1, 2, 4 and 8 worker processes'''
+    import random
+    rng = random.Random(1)
+    text = ' '.join(f"w{int(rng.paretovariate(1.1)) % 50000}" for _ in range(n))
+    print(f"markov: {os.cpu_count()} CPUs")
+    for workers in (1, 2, 4, 8):
+        elapsed = timed(foundation.MarkovModel(order).fit, text, workers=workers, min_parallel=0)
+        print(f"markov order={order} words={n:,} workers={workers}: {elapsed:.3f}s")
+
+
+BENCHMARKS = {
+    'noise': bench_noise,
+    'import': bench_import,
+    'passwords': bench_passwords,
+    'secret': bench_secret,
+    'markov': bench_markov,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
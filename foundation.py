@@ -1,10 +1,47 @@
+import array
+import atexit
+import bisect
+import codecs
+import collections
+import collections.abc
+import contextlib
+import functools
+import itertools
 import math
+import mmap
+import operator
+import os
+import queue
 import random
+import re
+import struct
+import sys
+import threading
 import time
+import weakref
 import string
-import tkinter
-import turtle
-from tkinter import messagebox
+
+# NumPy, tkinter, asyncio and concurrent.futures are imported on first use so that `import foundation` stays cheap
+# and works on machines without them (e.g. headless servers without Tk).
+numpy = None
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    '''Imports NumPy into the module namespace on first use; returns None when it is not installed'''
+    global numpy
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+@functools.lru_cache(maxsize=None)
+def _tkinter():
+    '''Imports tkinter together with its messagebox and simpledialog submodules on first use'''
+    import tkinter
+    import tkinter.messagebox
+    import tkinter.simpledialog
+    return tkinter
 
 def current_time():
     '''
@@ -78,6 +115,461 @@ def millisecond():
     '''
     return int((time.time() * 1000) % 1000)
 
+class CorpusIndex:
+    '''
+    Pre-tokenized corpus with word positions and neighbour tables for fast lookups
+    '''
+    def __init__(self, words=()):
+        self.words = []
+        self.positions = {}
+        self.next_words = {}
+        self.previous_words = {}
+        self.update(words)
+
+    def update(self, words):
+        """Appends words from any iterable to the index."""
+        previous = self.words[-1] if self.words else None
+        for i, word in enumerate(words, len(self.words)):
+            self.words.append(word)
+            self.positions.setdefault(word, []).append(i)
+            if i:
+                self.next_words.setdefault(previous, word)
+                self.previous_words.setdefault(word, previous)
+            previous = word
+        return self
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.positions
+
+    def next_word(self, word):
+        """Returns the word after the first occurrence of word, or None."""
+        return self.next_words.get(word)
+
+    def previous_word(self, word):
+        """Returns the word before the first occurrence of word, or None."""
+        return self.previous_words.get(word)
+
+    def count(self, word):
+        """Returns how many times word occurs in the corpus."""
+        return len(self.positions.get(word, ()))
+
+def _count_ngrams(tokens, skip, order, counts=None):
+    '''
+    Counts n-grams of every order up to order whose last token is at index skip or later.
+    '''
+    if counts is None:
+        counts = [collections.Counter() for _ in range(order + 1)]
+    for k, counter in enumerate(counts):
+        start = max(skip - k, 0)
+        counter.update(zip(*(tokens[start + i:] for i in range(k + 1))))
+    return counts
+
+_MODEL_MAGIC = b'FNDMKV1\n'
+_MODEL_HEADER = struct.Struct('<8sIIQ')
+_MODEL_COLUMN = struct.Struct('<c7xQ')
+
+class _PackedWords(collections.abc.Sequence):
+    '''
+    Read-only vocabulary decoded on demand from a UTF-8 blob and its offsets
+    '''
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, token):
+        return self.encoded(token).decode('utf-8')
+
+    def encoded(self, token):
+        """Returns the UTF-8 bytes of the word with the given id."""
+        return bytes(self.blob[self.offsets[token]:self.offsets[token + 1]])
+
+class _PackedIds(collections.abc.Mapping):
+    '''
+    Read-only word to id mapping backed by ids sorted by their UTF-8 bytes
+    '''
+    def __init__(self, words, order):
+        self.words = words
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __getitem__(self, word):
+        if not isinstance(word, str):
+            raise KeyError(word)
+        encoded = word.encode('utf-8')
+        i = bisect.bisect_left(self.order, encoded, key=lambda token: self.words.encoded(token))
+        if i == len(self.order) or self.words.encoded(self.order[i]) != encoded:
+            raise KeyError(word)
+        return self.order[i]
+
+def _pack_ngrams(counts, base, first_order=0):
+    '''
+    Packs per-order n-gram counters into (keys, offsets, successors, cumulative) array tables.
+    Counters start at order first_order; rows of the order before it are those of the single
+    empty context, so first_order may only be 0 or 1.
+    '''
+    tables = []
+    rows = {(): 0}
+    context_of = operator.itemgetter(slice(None, -1))
+    last_of = operator.itemgetter(-1)
+    for k, counter in enumerate(counts, first_order):
+        grams = sorted(counter)
+        contexts = list(map(context_of, grams))
+        unique = list(map(operator.itemgetter(0), itertools.groupby(contexts)))
+        ends = dict(zip(contexts, range(1, len(grams) + 1)))
+        if k:
+            prefixes = map(rows.__getitem__, map(context_of, unique))
+            keys = array.array('Q', map(operator.add, map(operator.mul, prefixes, itertools.repeat(base)),
+                                        map(last_of, unique)))
+        else:
+            keys = array.array('Q', [0] * len(unique))
+        offsets = array.array('Q', [0])
+        offsets.extend(map(ends.__getitem__, unique))
+        successors = array.array('I', map(last_of, grams))
+        cumulative = array.array('Q', itertools.accumulate(map(counter.__getitem__, grams)))
+        tables.append((keys, offsets, successors, cumulative))
+        rows = dict(zip(unique, range(len(unique))))
+    return tables
+
+def _intern_shard(words):
+    '''
+    Interns one shard of a corpus (a word list, or text to split) to shard-local ids.
+    Returns (words in first-occurrence order, local token ids, occurrences of each local id).
+    '''
+    if isinstance(words, str):
+        words = words.split()
+    ids = {}
+    tokens = array.array('I', [ids.setdefault(word, len(ids)) for word in words])
+    counts = collections.Counter(tokens)
+    return list(ids), tokens, array.array('Q', map(counts.__getitem__, range(len(ids))))
+
+def _bucket_positions(tokens, start, end, bounds, base):
+    '''
+    Groups the positions p in [start, end) by the range [bounds[j], bounds[j + 1]) holding the
+    key tokens[p] * base + tokens[p + 1] of the word pair there; returns one array per range.
+    '''
+    keys = array.array('Q', map(operator.add, map(operator.mul, tokens[start:end], itertools.repeat(base)),
+                                tokens[start + 1:end + 1]))
+    positions = sorted(range(len(keys)), key=keys.__getitem__)
+    cuts = [bisect.bisect_left(positions, bound, key=keys.__getitem__) for bound in bounds]
+    return [array.array('Q', map(operator.add, positions[low:high], itertools.repeat(start)))
+            for low, high in zip(cuts, cuts[1:])]
+
+def _pack_positions(tokens, positions, tail, order, base):
+    '''
+    Counts and packs the n-grams of orders 1..order that start at the given positions, plus
+    the n-grams in tail, which start too close to the end of tokens for the longer orders.
+    '''
+    columns = [array.array('I', map(tokens.__getitem__, map(operator.add, positions, itertools.repeat(i))))
+               for i in range(order + 1)]
+    counts = []
+    for k in range(1, order + 1):
+        counter = collections.Counter(zip(*columns[:k + 1]))
+        counter.update(gram for gram in tail if len(gram) == k + 1)
+        counts.append(counter)
+    return _pack_ngrams(counts, base, 1)
+
+def _shards(words, count):
+    '''Splits text at whitespace, or a word list, into count contiguous pieces of similar size'''
+    size = len(words)
+    cuts = [0]
+    for i in range(1, count):
+        cut = max(size * i // count, cuts[-1])
+        if isinstance(words, str):
+            while cut < size and not words[cut].isspace():
+                cut += 1
+        cuts.append(cut)
+    cuts.append(size)
+    return [words[low:high] for low, high in zip(cuts, cuts[1:])]
+
+def _join_partitions(parts, base):
+    '''
+    Concatenates tables packed by _pack_positions for consecutive word-pair ranges, shifting
+    keys, offsets and cumulative counts so they index the joined arrays. A one-word context
+    can straddle two ranges; its row then continues from one part into the next.
+    '''
+    tables = []
+    shifts = [0] * len(parts)
+    for k in range(len(parts[0])):
+        keys = array.array('Q')
+        offsets = array.array('Q')
+        successors = array.array('I')
+        cumulative = array.array('Q')
+        next_shifts = []
+        for part, shift in zip(parts, shifts):
+            part_keys, part_offsets, part_successors, part_cumulative = part[k]
+            total = cumulative[-1] if cumulative else 0
+            part_keys = array.array('Q', map(operator.add, part_keys, itertools.repeat(shift * base)))
+            first = int(bool(keys) and bool(part_keys) and part_keys[0] == keys[-1])
+            # Rows of this part's next order point at its rows here, which start at this index.
+            next_shifts.append(len(keys) - first)
+            keys.extend(part_keys[first:])
+            offsets.extend(map(operator.add, part_offsets[first:-1], itertools.repeat(len(successors))))
+            cumulative.extend(map(operator.add, part_cumulative, itertools.repeat(total)))
+            successors.extend(part_successors)
+        offsets.append(len(successors))
+        tables.append((keys, offsets, successors, cumulative))
+        shifts = next_shifts
+    return tables
+
+class MarkovModel:
+    '''
+    Order-n Markov chain text generator that is trained once and sampled many times.
+
+    Words are interned to integer ids and each order k (0..n) is stored as a
+    compact table of arrays: sorted context keys, row offsets, successor ids
+    and cumulative counts. A context key is the row of its prefix in the
+    order k-1 table times the vocabulary size plus its last id, so contexts
+    form a trie that is walked with binary search.
+    '''
+    def __init__(self, order=1):
+        if not isinstance(order, int) or order < 1:
+            raise ValueError("Order must be a positive integer")
+        self.order = order
+        self.vocabulary = []
+        self.ids = {}
+        self.tables = []
+        self._base = 1
+        self._tail = array.array('I')
+
+    def _split(self, text):
+        """Helper returning the word list of text, a CorpusIndex or a list of words."""
+        if isinstance(text, CorpusIndex):
+            return text.words
+        if isinstance(text, str):
+            return text.split()
+        return text
+
+    def _compile(self, counts):
+        """Helper packing per-order n-gram counters into array tables."""
+        self._base = max(len(self.vocabulary), 1)
+        self.tables = _pack_ngrams(counts, self._base)
+
+    def _counters(self):
+        """Helper unpacking the array tables back into per-order n-gram counters."""
+        counts = []
+        contexts = [()]
+        for k, (keys, offsets, successors, cumulative) in enumerate(self.tables):
+            if k:
+                contexts = [contexts[key // self._base] + (key % self._base,) for key in keys]
+            spans = map(operator.sub, offsets[1:], offsets)
+            grams = map(operator.add, itertools.chain.from_iterable(map(itertools.repeat, contexts, spans)),
+                        zip(successors))
+            totals = map(operator.sub, cumulative, itertools.chain((0,), cumulative))
+            counts.append(collections.Counter(dict(zip(grams, totals))))
+        counts.extend(collections.Counter() for _ in range(len(counts), self.order + 1))
+        return counts
+
+    def _row(self, context):
+        """Helper returning the table row of a context of ids, or None if unseen."""
+        row = 0
+        for k, token in enumerate(context, 1):
+            keys = self.tables[k][0]
+            key = row * self._base + token
+            row = bisect.bisect_left(keys, key)
+            if row == len(keys) or keys[row] != key:
+                return None
+        return row
+
+    def _sample(self, history):
+        """Helper drawing the next id, backing off to shorter contexts when unseen."""
+        for k in range(min(self.order, len(history)), -1, -1):
+            row = self._row(itertools.islice(history, len(history) - k, None))
+            if row is not None:
+                _, offsets, successors, cumulative = self.tables[k]
+                low, high = offsets[row], offsets[row + 1]
+                before = cumulative[low - 1] if low else 0
+                target = before + random.randrange(cumulative[high - 1] - before)
+                return successors[bisect.bisect_right(cumulative, target, low, high)]
+
+    def fit(self, text, workers=1, min_parallel=1 << 20):
+        """
+        Counts n-grams of every order up to self.order in text, a CorpusIndex or a list of words.
+        With workers > 1 and at least min_parallel words (characters, for a str) the work runs in
+        a process pool in three steps, each split evenly across the workers: contiguous shards
+        of the corpus are interned to local ids; shards of the remapped token array group their
+        positions by the word pair starting there, into pair ranges of similar size (quantiles
+        of a sample); and each range counts and packs only the n-grams starting at its positions.
+        Contexts sort by their words, so the packed ranges are joined in order.
+        The steps add up to roughly twice the work of a serial count, so this only pays off
+        with three or more free cores. Smaller inputs are counted in this process.
+        """
+        self.vocabulary = []
+        self.ids = {}
+        self.tables = []
+        self._tail = array.array('I')
+        if not isinstance(text, str):
+            text = self._split(text)
+            if not isinstance(text, collections.abc.Sequence):
+                text = list(text)
+        if workers <= 1 or len(text) < min_parallel:
+            return self.update(text)
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            tokens = array.array('I')
+            unigrams = array.array('Q')
+            for words, local, counts in executor.map(_intern_shard, _shards(text, workers)):
+                remap = [self.ids.setdefault(word, len(self.ids)) for word in words]
+                tokens.extend(map(remap.__getitem__, local))
+                unigrams.extend(itertools.repeat(0, len(self.ids) - len(unigrams)))
+                for token, count in zip(remap, counts):
+                    unigrams[token] += count
+            self.vocabulary = list(self.ids)
+            self._base = base = max(len(self.vocabulary), 1)
+            self._tail = tokens[-self.order:]
+            # The last order positions start n-grams that run off the end for the longer orders;
+            # they are left out of the buckets and handed to their range directly.
+            body = max(len(tokens) - self.order, 0)
+            step = max(body // (1024 * workers), 1)
+            sample = sorted(tokens[p] * base + tokens[p + 1] for p in range(0, body, step))
+            bounds = [0] + [sample[len(sample) * j // workers] for j in range(1, workers) if sample] + [base * base]
+            cuts = [body * i // workers for i in range(workers + 1)]
+            buckets = list(executor.map(_bucket_positions, itertools.repeat(tokens), cuts, cuts[1:],
+                                        itertools.repeat(bounds), itertools.repeat(base)))
+            positions = [array.array('Q', itertools.chain.from_iterable(bucket[j] for bucket in buckets))
+                         for j in range(len(bounds) - 1)]
+            tails = [[] for _ in positions]
+            for start in range(body, len(tokens) - 1):
+                owner = bisect.bisect_right(bounds, tokens[start] * base + tokens[start + 1]) - 1
+                tails[owner].extend(tuple(tokens[start:end]) for end in range(start + 2, len(tokens) + 1))
+            parts = list(executor.map(_pack_positions, itertools.repeat(tokens), positions, tails,
+                                      itertools.repeat(self.order), itertools.repeat(base)))
+        order_zero = collections.Counter({(token,): count for token, count in enumerate(unigrams) if count})
+        self.tables = _pack_ngrams([order_zero], self._base) + _join_partitions(parts, self._base)
+        return self
+
+    def _batches(self, words, batch_size):
+        """Helper interning words batch by batch, each prefixed with the tokens that precede it."""
+        while True:
+            batch = [self.ids.setdefault(word, len(self.ids)) for word in itertools.islice(words, batch_size)]
+            if not batch:
+                return
+            tokens = self._tail + array.array('I', batch)
+            yield tokens, len(self._tail)
+            self._tail = tokens[-self.order:]
+
+    def update(self, words, batch_size=1 << 16):
+        """
+        Streams words from any iterable into the model, batch_size words at a time.
+        Consecutive calls continue the same stream, so n-grams spanning calls are counted.
+        Peak memory depends on the number of distinct n-grams, not on the corpus size.
+        """
+        words = iter(self._split(words))
+        if not isinstance(self.ids, dict):
+            self.vocabulary = list(self.vocabulary)
+            self.ids = {word: token for token, word in enumerate(self.vocabulary)}
+        counts = self._counters()
+        for tokens, skip in self._batches(words, batch_size):
+            _count_ngrams(tokens, skip, self.order, counts)
+        self.vocabulary.extend(itertools.islice(self.ids, len(self.vocabulary), None))
+        self._compile(counts)
+        return self
+
+    def iter_generate(self, length, start_word=None):
+        """
+        Yields length words one at a time as they are sampled, starting from start_word when it is known.
+        Only the last order words are kept, so memory does not grow with length.
+        """
+        if not self.vocabulary or length <= 0:
+            return
+        history = collections.deque(maxlen=self.order)
+        if start_word is not None and start_word in self.ids:
+            history.append(self.ids[start_word])
+        else:
+            history.append(self._sample(history))
+        yield self.vocabulary[history[-1]]
+        for _ in range(length - 1):
+            history.append(self._sample(history))
+            yield self.vocabulary[history[-1]]
+
+    async def aiter_generate(self, length, start_word=None, chunk_size=64):
+        """
+        Asynchronously yields length words as they are sampled, handing control back
+        to the event loop every chunk_size words.
+        """
+        for count, word in enumerate(self.iter_generate(length, start_word), 1):
+            yield word
+            if count % chunk_size == 0:
+                import asyncio
+                await asyncio.sleep(0)
+
+    def generate(self, length, start_word=None):
+        """Generates length words, starting from start_word when it is known."""
+        return " ".join(self.iter_generate(length, start_word))
+
+    def save(self, path):
+        """Writes the model to path in a compact binary format that MarkovModel.load can memory-map."""
+        encoded = [word.encode('utf-8') for word in self.vocabulary]
+        columns = [
+            array.array('Q', itertools.accumulate(map(len, encoded), initial=0)),
+            array.array('B', b''.join(encoded)),
+            array.array('I', sorted(range(len(encoded)), key=encoded.__getitem__)),
+            self._tail,
+        ]
+        columns.extend(column for table in self.tables for column in table)
+        with open(path, 'wb') as handle:
+            handle.write(_MODEL_HEADER.pack(_MODEL_MAGIC, self.order, len(columns), self._base))
+            columns = [column if isinstance(column, array.array) else array.array(column.format, column)
+                       for column in columns]
+            for column in columns:
+                handle.write(_MODEL_COLUMN.pack(column.typecode.encode(), len(column)))
+            for column in columns:
+                if sys.byteorder == 'big':
+                    column = array.array(column.typecode, column)
+                    column.byteswap()
+                data = column.tobytes()
+                handle.write(data)
+                handle.write(bytes(-len(data) % 8))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Opens a model written by save. The file is memory-mapped, so tables are not copied
+        and processes loading the same file share its pages.
+        """
+        with open(path, 'rb') as handle:
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, order, count, base = _MODEL_HEADER.unpack_from(data)
+        if magic != _MODEL_MAGIC:
+            raise ValueError("Not a MarkovModel file")
+        view = memoryview(data)
+        position = _MODEL_HEADER.size + count * _MODEL_COLUMN.size
+        columns = []
+        for i in range(count):
+            typecode, length = _MODEL_COLUMN.unpack_from(data, _MODEL_HEADER.size + i * _MODEL_COLUMN.size)
+            typecode = typecode.decode()
+            size = length * array.array(typecode).itemsize
+            column = view[position:position + size].cast(typecode)
+            if sys.byteorder == 'big':
+                column = array.array(typecode, column)
+                column.byteswap()
+            columns.append(column)
+            position += size + -size % 8
+        model = cls(order)
+        model._base = base
+        model.vocabulary = _PackedWords(columns[0], columns[1])
+        model.ids = _PackedIds(model.vocabulary, columns[2])
+        model._tail = array.array('I', columns[3])
+        model.tables = [tuple(columns[i:i + 4]) for i in range(4, count, 4)]
+        return model
+
+    def memory_usage(self):
+        """Returns the approximate number of bytes held by the trained model."""
+        size = sys.getsizeof(self.vocabulary) + sys.getsizeof(self.ids)
+        size += sum(sys.getsizeof(word) for word in self.vocabulary)
+        size += sum(sys.getsizeof(column) for table in self.tables for column in table)
+        return size
+
 class LLM:
     '''
     Lightweight Language Model with basic text manipulation and generation
@@ -91,8 +583,69 @@ class LLM:
             return []
         return text.split()
 
+    def _words(self, text):
+        """Helper returning the word list of raw text or a CorpusIndex."""
+        if isinstance(text, CorpusIndex):
+            return text.words
+        return self._split_text(text)
+
+    def build_index(self, text):
+        """Tokenizes text once and returns a reusable CorpusIndex."""
+        return CorpusIndex(self._split_text(text))
+
+    def iter_words(self, source, chunk_size=1 << 16, encoding='utf-8'):
+        """
+        Yields words from a file path, a file object or an iterable of text chunks.
+        Text is read chunk by chunk, and words split across chunk boundaries are rejoined.
+        Binary file objects and bytes chunks are decoded with encoding.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, encoding=encoding) as handle:
+                yield from self.iter_words(handle, chunk_size)
+            return
+        if hasattr(source, 'read'):
+            source = itertools.takewhile(bool, map(source.read, itertools.repeat(chunk_size)))
+        carry = ''
+        for chunk in self._decode(source, encoding):
+            if not chunk:
+                continue
+            words = (carry + chunk).split()
+            carry = words.pop() if words and not chunk[-1].isspace() else ''
+            yield from words
+        if carry:
+            yield carry
+
+    def _decode(self, chunks, encoding):
+        """Yields chunks as text, decoding bytes incrementally so multi-byte characters may span chunks."""
+        decoder = None
+        for chunk in chunks:
+            if isinstance(chunk, (bytes, bytearray)):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder(encoding)()
+                chunk = decoder.decode(chunk)
+            yield chunk
+        if decoder is not None:
+            yield decoder.decode(b'', final=True)
+
+    def index_stream(self, source, chunk_size=1 << 16):
+        """
+        Builds a CorpusIndex from a file path, file object or chunk iterable, reading it chunk
+        by chunk. The index itself keeps every word and position, so its memory grows with the corpus.
+        """
+        return CorpusIndex(self.iter_words(source, chunk_size))
+
+    def train_stream(self, source, order=1, chunk_size=1 << 16, workers=1):
+        """
+        Trains a MarkovModel from a file path, file object or chunk iterable, reading it incrementally.
+        With workers=1, memory grows with the number of distinct n-grams rather than the corpus length;
+        the parallel path also keeps one 4-byte id per word.
+        """
+        return MarkovModel(order).fit(self.iter_words(source, chunk_size), workers)
+
     def NextWord(self, text, word):
         """Returns the word after the given word, or None if not found or last."""
+        if isinstance(text, CorpusIndex):
+            return text.next_word(word)
         words = self._split_text(text)
         for i in range(len(words) - 1):
             if words[i] == word:
@@ -101,6 +654,8 @@ class LLM:
 
     def PreviousWord(self, text, word):
         """Returns the word before the given word, or None if not found or first."""
+        if isinstance(text, CorpusIndex):
+            return text.previous_word(word)
         words = self._split_text(text)
         for i in range(1, len(words)):
             if words[i] == word:
@@ -109,39 +664,73 @@ class LLM:
 
     def RandomWord(self, text):
         """Returns a random word from the text, or None if text is empty."""
-        words = self._split_text(text)
+        words = self._words(text)
         return random.choice(words) if words else None
 
-    def GenerateText(self, text, length, start_word=None):
+    def train(self, text, order=1, workers=1):
+        """Trains a reusable order-n MarkovModel on text or a CorpusIndex, optionally in a process pool."""
+        return MarkovModel(order).fit(self._words(text), workers)
+
+    def GenerateText(self, text, length, start_word=None, order=1):
         """
         Generates text of specified length using a simple Markov-like approach.
         If start_word is None, picks a random word to begin.
+        Accepts raw text, a CorpusIndex or a trained MarkovModel.
         """
-        words = self._split_text(text)
-        if not words or length <= 0:
-            return ""
+        model = text if isinstance(text, MarkovModel) else self.train(text, order)
+        return model.generate(length, start_word)
 
-        transitions = {}
-        for i in range(len(words) - 1):
-            current = words[i]
-            next_word = words[i + 1]
-            if current not in transitions:
-                transitions[current] = []
-            transitions[current].append(next_word)
-
-        if start_word is None or start_word not in words:
-            current = random.choice(words)
-        else:
-            current = start_word
+    def iter_generate(self, text, length, start_word=None, order=1):
+        """Like GenerateText, but yields the words one at a time as they are sampled."""
+        model = text if isinstance(text, MarkovModel) else self.train(text, order)
+        return model.iter_generate(length, start_word)
 
-        result = [current]
-        for _ in range(length - 1):
-            if current in transitions and transitions[current]:
-                current = random.choice(transitions[current])
-            else:
-                current = random.choice(words)
-            result.append(current)
-        return " ".join(result)
+    def aiter_generate(self, text, length, start_word=None, order=1):
+        """Like iter_generate, but returns an async generator for use with async for."""
+        model = text if isinstance(text, MarkovModel) else self.train(text, order)
+        return model.aiter_generate(length, start_word)
+
+    def _index(self, corpus):
+        """Helper returning corpus as a CorpusIndex, building it from raw text if needed."""
+        return corpus if isinstance(corpus, CorpusIndex) else self.build_index(corpus)
+
+    def NextWords(self, corpus, words, lazy=False):
+        """
+        Returns the word after each of the given words, using one shared index.
+        With lazy=True an iterator over the results is returned instead of a list.
+        """
+        results = map(self._index(corpus).next_words.get, words)
+        return results if lazy else list(results)
+
+    def PreviousWords(self, corpus, words, lazy=False):
+        """
+        Returns the word before each of the given words, using one shared index.
+        With lazy=True an iterator over the results is returned instead of a list.
+        """
+        results = map(self._index(corpus).previous_words.get, words)
+        return results if lazy else list(results)
+
+    def RandomWords(self, corpus, n, lazy=False):
+        """
+        Returns n random words from the corpus, or n Nones if it is empty.
+        With lazy=True an iterator over the results is returned instead of a list.
+        """
+        words = self._words(corpus)
+        results = map(random.choice, itertools.repeat(words, n)) if words else itertools.repeat(None, n)
+        return results if lazy else list(results)
+
+    def GenerateMany(self, model, n, length, seeds=None, order=1, lazy=False):
+        """
+        Generates n texts of the given length from one MarkovModel, trained once if raw text is given.
+        seeds is an optional sequence of start words, one per text; texts beyond the end of
+        seeds start from a random word.
+        With lazy=True an iterator over the results is returned instead of a list.
+        """
+        if not isinstance(model, MarkovModel):
+            model = self.train(model, order)
+        seeds = itertools.islice(itertools.chain(seeds or (), itertools.repeat(None)), n)
+        results = map(model.generate, itertools.repeat(length, n), seeds)
+        return results if lazy else list(results)
 
 def pi():
     '''Returns the value of pi'''
@@ -151,24 +740,172 @@ def e():
     '''Returns the value of e'''
     return math.e
 
+_DICE_TERM = re.compile(r'\s*([+-]?)\s*(?:(\d*)[dD](\d+)|(\d+))\s*')
+
+@functools.lru_cache(maxsize=256)
+def _parse_dice(expression):
+    '''
+    Parses a dice expression such as "3d6+2", "d20" or "2d8-1d4+1" into
+    (terms, constant), where terms is a tuple of (count, sides, sign)
+    '''
+    terms = []
+    constant = 0
+    position = 0
+    while position < len(expression):
+        match = _DICE_TERM.match(expression, position)
+        if match is None or match.end() == position or (position and not match.group(1)):
+            raise ValueError(f"Invalid dice expression: {expression!r}")
+        sign, count, sides, number = match.groups()
+        sign = -1 if sign == '-' else 1
+        if number is not None:
+            constant += sign * int(number)
+        else:
+            count = int(count) if count else 1
+            if int(sides) < 1:
+                raise ValueError("Sides must be a positive integer")
+            terms.append((count, int(sides), sign))
+        position = match.end()
+    if not terms and position == 0:
+        raise ValueError(f"Invalid dice expression: {expression!r}")
+    return tuple(terms), constant
+
 class Dice:
     '''
     Dice Rolling Simulator
+    Rolls come from the instance's own random.Random(seed) (or NumPy generator), so seeded
+    simulations are reproducible, also when several run in parallel.
+    Besides a number of sides, rolls accept dice expressions such as "3d6+2" or "2d8-1d4".
     '''
-    def __init__(self):
+    def __init__(self, seed=None, backend=None):
         self.name = 'Dice'
-
-    def roll(self, sides):
-        """Rolls a die with the given number of sides."""
+        self.seed = seed
+        self.backend = backend
+        self.random = random.Random(seed)
+        self._numpy_random = None
+
+    def _terms(self, sides):
+        if isinstance(sides, str):
+            return _parse_dice(sides)
         if not isinstance(sides, int) or sides < 1:
             raise ValueError("Sides must be a positive integer")
-        return random.randint(1, sides)
+        return ((1, sides, 1),), 0
+
+    def roll(self, sides):
+        """Rolls a die with the given number of sides, or a dice expression such as "3d6+2"."""
+        terms, constant = self._terms(sides)
+        randint = self.random.randint
+        return constant + sum(sign * randint(1, die) for count, die, sign in terms for _ in range(count))
+
+    def _backend(self):
+        backend = self.backend or ('numpy' if _numpy() is not None else 'python')
+        if backend not in ('numpy', 'python'):
+            raise ValueError("Backend must be 'numpy' or 'python'")
+        if backend == 'numpy' and _numpy() is None:
+            raise ValueError("The numpy backend requires NumPy to be installed")
+        return backend
+
+    def roll_many(self, sides, n):
+        """
+        Returns n rolls of a die or dice expression, as a NumPy int64 array with the numpy
+        backend or an array('q') otherwise.
+        """
+        terms, constant = self._terms(sides)
+        if self._backend() == 'numpy':
+            if self._numpy_random is None:
+                # Seeded from the instance's own Random, so any seed random.Random accepts works here too.
+                self._numpy_random = numpy.random.default_rng(self.random.getrandbits(128))
+            totals = numpy.full(n, constant, dtype=numpy.int64)
+            for count, die, sign in terms:
+                rolls = self._numpy_random.integers(1, die + 1, size=(n, count), dtype=numpy.int64)
+                totals += sign * rolls.sum(axis=1)
+            return totals
+        totals = array.array('q', itertools.repeat(constant, n))
+        for count, die, sign in terms:
+            rolls = self.random.choices(range(sign, sign * (die + 1), sign), k=n * count)
+            sums = rolls if count == 1 else map(sum, zip(*[iter(rolls)] * count))
+            totals = array.array('q', map(operator.add, totals, sums))
+        return totals
+
+    def distribution(self, sides, exact=False):
+        """
+        Returns {total: probability} for a die or dice expression, computed exactly by
+        convolving the dice one at a time. With exact=True the probabilities are Fractions.
+        """
+        terms, constant = self._terms(sides)
+        counts = [1]
+        offset = constant
+        outcomes = 1
+        for count, die, sign in terms:
+            for _ in range(count):
+                prefix = [0, *itertools.accumulate(counts)]
+                size = len(counts)
+                counts = [prefix[min(i + 1, size)] - prefix[max(i - die + 1, 0)] for i in range(size + die - 1)]
+                offset += 1 if sign > 0 else -die
+            outcomes *= die ** count
+        if exact:
+            import fractions
+            return {offset + i: fractions.Fraction(ways, outcomes) for i, ways in enumerate(counts)}
+        return {offset + i: ways / outcomes for i, ways in enumerate(counts)}
+
+    def histogram(self, rolls):
+        """Returns {total: count} for a sequence of rolls, e.g. the result of roll_many."""
+        if _numpy() is not None and isinstance(rolls, numpy.ndarray):
+            totals, counts = numpy.unique(rolls, return_counts=True)
+            return dict(zip(totals.tolist(), counts.tolist()))
+        return dict(sorted(collections.Counter(rolls).items()))
+
+@functools.lru_cache(maxsize=128)
+def _permutation_table(seed):
+    '''
+    Returns the doubled Perlin permutation table for a seed, shuffled with its own Random
+    '''
+    p = list(range(256))
+    random.Random(seed).shuffle(p)
+    return tuple(p * 2)
+
+def _noise_band(generator, p, left, top, width, height, scale, backend):
+    '''
+    Renders one band of noise rows in a worker process
+    '''
+    _numpy()
+    return generator._noise(p, left, top, width, height, scale, backend)
+
+@functools.lru_cache(maxsize=64)
+def _palette_table(chars, steps=64):
+    '''
+    Returns (table, half) where table[int((value + 3) * half)] is the palette character for a
+    noise value in [-3, 3]. Each of the len(chars) - 1 character intervals spans steps entries,
+    so characters change where int((value + 1) / 2 * (len(chars) - 1)) does, up to floating-point
+    rounding for values that fall right on an interval boundary.
+    '''
+    levels = (len(chars) - 1) * steps
+    core = ''.join(chars[bucket // steps] for bucket in range(levels + 1))
+    return chars[0] * levels + core + chars[-1] * levels, levels / 2
+
+@functools.lru_cache(maxsize=64)
+def _palette_array(table):
+    '''
+    Returns a _palette_table as a NumPy array of single characters
+    '''
+    return numpy.array(list(table))
 
 class ASCIIImageGenerator:
     '''
-    Simple ASCII art generator using Perlin noise concepts
+    Simple ASCII art generator using Perlin noise concepts.
+    The noise grid is computed with NumPy when it is installed and backend is not 'python'.
+    A seeded generator reuses one cached permutation table, so the same seed renders the
+    same art in every process; an unseeded one shuffles a new table per render. Either way
+    it draws from its own random.Random instead of the global random module.
+    With octaves > 1 the noise is fractal Brownian motion: each octave is sampled at
+    lacunarity times the frequency and persistence times the amplitude of the previous one.
     '''
-    def __init__(self):
+    def __init__(self, backend=None, seed=None, octaves=1, lacunarity=2.0, persistence=0.5):
+        self.backend = backend
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.octaves = octaves
+        self.lacunarity = lacunarity
+        self.persistence = persistence
         self.palette = {
             "cloudy": " .:-=+*#%@",
             "forest": " .^~|T#%@",
@@ -188,19 +925,46 @@ class ASCIIImageGenerator:
         v = y if h < 4 else x
         return (u if (h & 1) == 0 else -u) + (v if (h & 2) == 0 else -v)
 
-    def perlin_noise(self, width, height, scale=10):
-        """Generates a 2D noise map using a simplified Perlin noise algorithm."""
+    def grad3(self, hash_val, x, y, z):
+        h = hash_val & 15
+        u = x if h < 8 else y
+        v = y if h < 4 else (x if h == 12 or h == 14 else z)
+        return (u if (h & 1) == 0 else -u) + (v if (h & 2) == 0 else -v)
+
+    def permutation(self):
+        """Returns the 256-entry permutation table: cached for a seeded generator, freshly shuffled otherwise."""
+        if self.seed is not None:
+            return list(_permutation_table(self.seed)[:256])
         p = list(range(256))
-        random.shuffle(p)
-        p = p * 2  
+        self.random.shuffle(p)
+        return p
+
+    def _grad_array(self, hash_val, x, y):
+        """Vectorized grad over NumPy arrays."""
+        h = hash_val & 15
+        u = numpy.where(h < 8, x, y)
+        v = numpy.where(h < 4, y, x)
+        return numpy.where((h & 1) == 0, u, -u) + numpy.where((h & 2) == 0, v, -v)
+
+    def _grad3_array(self, hash_val, x, y, z):
+        """Vectorized grad3 over NumPy arrays."""
+        h = hash_val & 15
+        u = numpy.where(h < 8, x, y)
+        v = numpy.where(h < 4, y, numpy.where((h == 12) | (h == 14), x, z))
+        return numpy.where((h & 1) == 0, u, -u) + numpy.where((h & 2) == 0, v, -v)
+
+    def _perlin_python(self, p, left, top, width, height, scale):
+        """Helper evaluating the noise grid pixel by pixel."""
         noise = []
-        for y in range(height):
+        for y in range(top, top + height):
             row = []
-            for x in range(width):
-                X = int(x / scale)
-                Y = int(y / scale)
+            for x in range(left, left + width):
+                X = math.floor(x / scale)
+                Y = math.floor(y / scale)
                 xf = (x / scale) - X
                 yf = (y / scale) - Y
+                X &= 255
+                Y &= 255
                 u = self.fade(xf)
                 v = self.fade(yf)
                 aa = p[p[X] + Y]
@@ -214,66 +978,606 @@ class ASCIIImageGenerator:
             noise.append(row)
         return noise
 
-    def generate_ascii(self, width=40, height=20, prompt="default"):
-        """Generates ASCII art based on noise and a prompt."""
+    def _perlin_numpy(self, p, left, top, width, height, scale):
+        """Helper evaluating the noise grid with NumPy, computing lattice and fade values once per row and column."""
+        p = numpy.array(p)
+        xs = numpy.arange(left, left + width) / scale
+        ys = numpy.arange(top, top + height) / scale
+        X = numpy.floor(xs)
+        Y = numpy.floor(ys)
+        xf = (xs - X)[numpy.newaxis, :]
+        yf = (ys - Y)[:, numpy.newaxis]
+        X = X.astype(numpy.int64) & 255
+        Y = (Y.astype(numpy.int64) & 255)[:, numpy.newaxis]
+        u = self.fade(xf)
+        v = self.fade(yf)
+        a = p[X] + Y
+        b = p[X + 1] + Y
+        x1 = self.lerp(self._grad_array(p[a], xf, yf), self._grad_array(p[b], xf - 1, yf), u)
+        x2 = self.lerp(self._grad_array(p[a + 1], xf, yf - 1), self._grad_array(p[b + 1], xf - 1, yf - 1), u)
+        return self.lerp(x1, x2, v)
+
+    def _backend(self, backend):
+        """Helper resolving and validating the noise backend."""
+        _numpy()
+        backend = backend or self.backend or ('numpy' if numpy is not None else 'python')
+        if backend not in ('numpy', 'python'):
+            raise ValueError("Backend must be 'numpy' or 'python'")
+        if backend == 'numpy' and numpy is None:
+            raise ValueError("The numpy backend requires NumPy to be installed")
+        return backend
+
+    def _table(self, permutation):
+        """Helper returning the doubled permutation table used for one render."""
+        if permutation is not None:
+            return list(permutation) * 2
+        if self.seed is not None:
+            return _permutation_table(self.seed)
+        return self.permutation() * 2
+
+    def _noise(self, p, left, top, width, height, scale, backend):
+        """Helper evaluating the fractal noise of a viewport as nested lists, or as an array with NumPy."""
+        evaluate = self._perlin_numpy if backend == 'numpy' else self._perlin_python
+        if self.octaves <= 1:
+            return evaluate(p, left, top, width, height, scale)
+        total = None
+        amplitude = 1.0
+        frequency = 1.0
+        norm = 0.0
+        for _ in range(self.octaves):
+            layer = evaluate(p, left, top, width, height, scale / frequency)
+            if backend == 'numpy':
+                total = layer * amplitude if total is None else total + layer * amplitude
+            elif total is None:
+                total = [[value * amplitude for value in row] for row in layer]
+            else:
+                total = [[sum_ + value * amplitude for sum_, value in zip(sum_row, row)]
+                         for sum_row, row in zip(total, layer)]
+            norm += amplitude
+            amplitude *= self.persistence
+            frequency *= self.lacunarity
+        if backend == 'numpy':
+            return total / norm
+        return [[value / norm for value in row] for row in total]
+
+    def _characters(self, grid, table, half, backend, width):
+        """Helper mapping a noise grid to rows of palette characters through a _palette_table."""
+        if backend == 'python':
+            return [''.join([table[int((value + 3) * half)] for value in row]) for row in grid]
+        if not width:
+            return [''] * len(grid)
+        art = numpy.ascontiguousarray(_palette_array(table)[((grid + 3) * half).astype(numpy.int64)])
+        return art.view(f'<U{width}').ravel().tolist()
+
+    def _rows(self, grid):
+        """Helper converting a grid from _noise into nested lists."""
+        return grid.tolist() if numpy is not None and isinstance(grid, numpy.ndarray) else grid
+
+    def _bands(self, width, height, scale, p, backend, x, y, band, workers):
+        """Helper yielding the noise of a map band by band, rendered in a process pool when workers > 1."""
+        bands = [(top, min(band, height - top)) for top in range(0, height, band)]
+        if workers <= 1:
+            for top, rows in bands:
+                yield self._noise(p, x, y + top, width, rows, scale, backend)
+            return
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            pending = collections.deque()
+            for top, rows in bands:
+                pending.append(executor.submit(_noise_band, self, p, x, y + top, width, rows, scale, backend))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def perlin_noise(self, width, height, scale=10, permutation=None, backend=None, x=0, y=0, workers=1):
+        """
+        Generates a 2D noise map using a simplified Perlin noise algorithm.
+        x and y give the top-left corner of the viewport on an unbounded map that repeats every 256 * scale cells.
+        permutation is an optional shuffled list of range(256); by default self.permutation() is used.
+        backend is 'numpy' or 'python'; by default NumPy is used when available.
+        Both backends return identical values for the same permutation.
+        With workers > 1 bands of rows are rendered in a process pool.
+        """
+        if workers > 1:
+            return list(self.iter_noise_rows(width, height, scale, permutation, backend, x, y, workers=workers))
+        backend = self._backend(backend)
+        return self._rows(self._noise(self._table(permutation), x, y, width, height, scale, backend))
+
+    def iter_noise_rows(self, width, height, scale=10, permutation=None, backend=None, x=0, y=0, band=16, workers=1):
+        """
+        Yields the rows of a noise map one at a time, computing band rows at once,
+        so memory depends on width and band rather than on height.
+        With workers > 1 bands are rendered in a process pool sharing one permutation table
+        and yielded in order, with at most two bands per worker in flight.
+        """
+        backend = self._backend(backend)
+        for grid in self._bands(width, height, scale, self._table(permutation), backend, x, y, band, workers):
+            yield from self._rows(grid)
+
+    def iter_tiles(self, width, height, tile_size=64, scale=10, permutation=None, backend=None, x=0, y=0):
+        """
+        Yields (x, y, tile) for tile_size square tiles covering a noise map, row by row.
+        Tiles are cut from one continuous map, so their edges line up seamlessly.
+        """
+        backend = self._backend(backend)
+        p = self._table(permutation)
+        for top in range(0, height, tile_size):
+            for left in range(0, width, tile_size):
+                tile = self._noise(p, x + left, y + top, min(tile_size, width - left),
+                                   min(tile_size, height - top), scale, backend)
+                yield x + left, y + top, self._rows(tile)
+
+    def iter_ascii(self, width=40, height=20, prompt="default", x=0, y=0, workers=1):
+        """
+        Yields the rows of ASCII art one at a time, for a viewport starting at x, y.
+        Noise values are mapped to characters through a precomputed lookup table and
+        each row is built in one join.
+        """
         if prompt not in self.palette:
             prompt = "default"
-        chars = self.palette[prompt]
-        noise = self.perlin_noise(width, height)
-        output = []
-        for y in range(height):
-            row = ""
-            for x in range(width):
-                value = (noise[y][x] + 1) / 2  
-                idx = int(value * (len(chars) - 1))
-                row += chars[idx]
-            output.append(row)
-        return "\n".join(output)
+        table, half = _palette_table(self.palette[prompt])
+        backend = self._backend(None)
+        for grid in self._bands(width, height, 10, self._table(None), backend, x, y, 16, workers):
+            yield from self._characters(grid, table, half, backend, width)
+
+    def generate_ascii(self, width=40, height=20, prompt="default", out=None, x=0, y=0, workers=1):
+        """
+        Generates ASCII art based on noise and a prompt.
+        When out is a file object the rows are written to it as they are generated and None is returned.
+        With workers > 1 the noise is rendered in a process pool.
+        """
+        rows = self.iter_ascii(width, height, prompt, x, y, workers)
+        if out is None:
+            return "\n".join(rows)
+        for row in rows:
+            out.write(row + "\n")
+
+    def animate(self, width=40, height=20, prompt="default", scale=10, speed=0.05):
+        """Returns an ASCIIAnimation that evolves this generator's noise over time."""
+        return ASCIIAnimation(self, width, height, prompt, scale, speed)
+
+class ASCIIAnimation:
+    '''
+    Animated ASCII art sampled from 3D Perlin noise at (x, y, time).
+    Everything that depends only on x and y (cell offsets, fade weights and the first two
+    levels of permutation hashing) is computed once per octave. Each frame only hashes the
+    time lattice, which is cached while time stays in the same cell, and blends gradients.
+    frame_time holds the seconds spent rendering the last frame and fps the achieved rate.
+    '''
+    def __init__(self, generator, width=40, height=20, prompt="default", scale=10, speed=0.05):
+        self.generator = generator
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.time = 0.0
+        self.frames = 0
+        self.frame_time = 0.0
+        self.total_time = 0.0
+        self.fps = 0.0
+        if prompt not in generator.palette:
+            prompt = "default"
+        self.table, self.half = _palette_table(generator.palette[prompt])
+        self.backend = generator._backend(None)
+        self.p = generator._table(None)
+        if self.backend == 'numpy':
+            self.p = numpy.array(self.p)
+        self.layers = []
+        amplitude = 1.0
+        frequency = 1.0
+        for _ in range(max(generator.octaves, 1)):
+            self.layers.append(self._layer(scale / frequency, frequency, amplitude))
+            amplitude *= generator.persistence
+            frequency *= generator.lacunarity
+        self.norm = sum(layer['amplitude'] for layer in self.layers)
+
+    def _layer(self, scale, frequency, amplitude):
+        """Helper precomputing the time-independent part of one octave."""
+        p = self.p
+        fade = self.generator.fade
+        layer = {'frequency': frequency, 'amplitude': amplitude, 'cell': None}
+        if self.backend == 'numpy':
+            xs = numpy.arange(self.width) / scale
+            ys = numpy.arange(self.height) / scale
+            X = numpy.floor(xs)
+            Y = numpy.floor(ys)
+            layer['xf'] = (xs - X)[numpy.newaxis, :]
+            layer['yf'] = (ys - Y)[:, numpy.newaxis]
+            X = X.astype(numpy.int64) & 255
+            Y = (Y.astype(numpy.int64) & 255)[:, numpy.newaxis]
+            a = p[X] + Y
+            b = p[X + 1] + Y
+            layer['hashes'] = (p[a], p[a + 1], p[b], p[b + 1])
+        else:
+            xs = [x / scale for x in range(self.width)]
+            ys = [y / scale for y in range(self.height)]
+            layer['xf'] = [x - math.floor(x) for x in xs]
+            layer['yf'] = [y - math.floor(y) for y in ys]
+            columns = [math.floor(x) & 255 for x in xs]
+            layer['hashes'] = [[(p[p[X] + Y], p[p[X] + Y + 1], p[p[X + 1] + Y], p[p[X + 1] + Y + 1])
+                                for X in columns] for Y in (math.floor(y) & 255 for y in ys)]
+        layer['u'] = fade(layer['xf']) if self.backend == 'numpy' else [fade(x) for x in layer['xf']]
+        layer['v'] = fade(layer['yf']) if self.backend == 'numpy' else [fade(y) for y in layer['yf']]
+        return layer
+
+    def _corners(self, layer, z):
+        """Helper returning the eight corner hashes of the time cell containing z."""
+        p = self.p
+        cell = math.floor(z) & 255
+        if layer['cell'] != cell:
+            if self.backend == 'numpy':
+                a, a1, b, b1 = (hashes + cell for hashes in layer['hashes'])
+                layer['corners'] = (p[a], p[b], p[a1], p[b1], p[a + 1], p[b + 1], p[a1 + 1], p[b1 + 1])
+            else:
+                layer['corners'] = [[(p[a + cell], p[b + cell], p[a1 + cell], p[b1 + cell],
+                                      p[a + cell + 1], p[b + cell + 1], p[a1 + cell + 1], p[b1 + cell + 1])
+                                     for a, a1, b, b1 in row] for row in layer['hashes']]
+            layer['cell'] = cell
+        return layer['corners']
+
+    def _noise_numpy(self, layer, z):
+        """Helper evaluating one octave of the frame at time z with NumPy."""
+        generator = self.generator
+        grad = generator._grad3_array
+        lerp = generator.lerp
+        h000, h100, h010, h110, h001, h101, h011, h111 = self._corners(layer, z)
+        xf, yf, u, v = layer['xf'], layer['yf'], layer['u'], layer['v']
+        zf = z - math.floor(z)
+        near = lerp(lerp(grad(h000, xf, yf, zf), grad(h100, xf - 1, yf, zf), u),
+                    lerp(grad(h010, xf, yf - 1, zf), grad(h110, xf - 1, yf - 1, zf), u), v)
+        far = lerp(lerp(grad(h001, xf, yf, zf - 1), grad(h101, xf - 1, yf, zf - 1), u),
+                   lerp(grad(h011, xf, yf - 1, zf - 1), grad(h111, xf - 1, yf - 1, zf - 1), u), v)
+        return lerp(near, far, generator.fade(zf))
+
+    def _noise_python(self, layer, z):
+        """Helper evaluating one octave of the frame at time z pixel by pixel."""
+        generator = self.generator
+        grad = generator.grad3
+        lerp = generator.lerp
+        zf = z - math.floor(z)
+        w = generator.fade(zf)
+        grid = []
+        for corners, yf, v in zip(self._corners(layer, z), layer['yf'], layer['v']):
+            row = []
+            for (h000, h100, h010, h110, h001, h101, h011, h111), xf, u in zip(corners, layer['xf'], layer['u']):
+                near = lerp(lerp(grad(h000, xf, yf, zf), grad(h100, xf - 1, yf, zf), u),
+                            lerp(grad(h010, xf, yf - 1, zf), grad(h110, xf - 1, yf - 1, zf), u), v)
+                far = lerp(lerp(grad(h001, xf, yf, zf - 1), grad(h101, xf - 1, yf, zf - 1), u),
+                           lerp(grad(h011, xf, yf - 1, zf - 1), grad(h111, xf - 1, yf - 1, zf - 1), u), v)
+                row.append(lerp(near, far, w))
+            grid.append(row)
+        return grid
+
+    def noise(self, t=None):
+        """Returns the noise of the frame at time t (self.time by default), as an array with NumPy."""
+        t = self.time if t is None else t
+        total = None
+        for layer in self.layers:
+            if self.backend == 'numpy':
+                values = self._noise_numpy(layer, t * layer['frequency']) * layer['amplitude']
+                total = values if total is None else total + values
+            else:
+                values = self._noise_python(layer, t * layer['frequency'])
+                if total is None:
+                    total = [[value * layer['amplitude'] for value in row] for row in values]
+                else:
+                    total = [[sum_ + value * layer['amplitude'] for sum_, value in zip(sum_row, row)]
+                             for sum_row, row in zip(total, values)]
+        if len(self.layers) == 1:
+            return total
+        if self.backend == 'numpy':
+            return total / self.norm
+        return [[value / self.norm for value in row] for row in total]
+
+    def render(self, t=None):
+        """Renders the frame at time t (self.time by default) and records how long it took."""
+        start = time.perf_counter()
+        rows = self.generator._characters(self.noise(t), self.table, self.half, self.backend, self.width)
+        frame = "\n".join(rows)
+        self.frame_time = time.perf_counter() - start
+        self.total_time += self.frame_time
+        self.frames += 1
+        return frame
+
+    def average_frame_time(self):
+        """Returns the mean seconds spent rendering a frame so far."""
+        return self.total_time / self.frames if self.frames else 0.0
+
+    def play(self, fps=10, frames=None):
+        """
+        Yields successive frames, advancing time by speed each frame and sleeping so that
+        frames are produced at most fps times per second. Runs forever unless frames is given.
+        """
+        interval = 1.0 / fps
+        start = time.perf_counter()
+        count = 0
+        while frames is None or count < frames:
+            delay = start + count * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            frame = self.render()
+            self.time += self.speed
+            if count:
+                self.fps = count / (time.perf_counter() - start)
+            count += 1
+            yield frame
+
+_TWO_TO_MINUS_53 = 2.0 ** -53
+
+_secrets = weakref.WeakSet()
+
+def _reset_secrets():
+    '''Drops every Secret's buffer in a forked child so it does not repeat the parent's values'''
+    for secret in _secrets:
+        secret.lock = threading.Lock()
+        secret.words = iter(())
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_secrets)
 
 class Secret:
     '''
     Real randomness number generator
+    Values come from os.urandom, read in buffers of buffer_size bytes so that a syscall is made
+    once per buffer rather than once per value. The buffer is handed out as 64-bit words through
+    an iterator over a memoryview; next() on it is atomic, so threads never share a word and the
+    per-value path takes no lock. Integers are drawn by rejection sampling (no modulo bias) and
+    floats have the full 53 bits of precision. A forked child starts from a fresh buffer.
     '''
-    def __init__(self):
-        pass
+    def __init__(self, buffer_size=1 << 16):
+        self.buffer_size = max(buffer_size + -buffer_size % 8, 8)
+        self.words = iter(())
+        self.lock = threading.Lock()
+        _secrets.add(self)
+
+    def _refill(self):
+        '''Starts a fresh buffer and returns its first word'''
+        with self.lock:
+            self.words = iter(memoryview(os.urandom(self.buffer_size)).cast('Q'))
+            return next(self.words)
+
+    def word(self):
+        '''Returns a random int with 64 random bits'''
+        try:
+            return next(self.words)
+        except StopIteration:
+            return self._refill()
+
+    def randbytes(self, n):
+        '''Returns n random bytes; requests of at least buffer_size bytes are read directly'''
+        if n >= self.buffer_size:
+            return os.urandom(n)
+        count = (n + 7) // 8
+        words = array.array('Q', itertools.islice(self.words, count))
+        while len(words) < count:
+            words.append(self._refill())
+            words.extend(itertools.islice(self.words, count - len(words)))
+        return words.tobytes()[:n]
+
+    def randbits(self, k):
+        '''Returns a random int with k random bits'''
+        if k <= 64:
+            try:
+                return next(self.words) >> (64 - k)
+            except StopIteration:
+                return self._refill() >> (64 - k)
+        return int.from_bytes(self.randbytes((k + 7) // 8), 'little') >> (-k % 8)
+
+    def randbelow(self, n):
+        '''Returns a random int in [0, n)'''
+        if n <= 0:
+            raise ValueError("n must be positive")
+        k = n.bit_length()
+        if k > 64:
+            r = self.randbits(k)
+            while r >= n:
+                r = self.randbits(k)
+            return r
+        shift = 64 - k
+        while True:
+            try:
+                r = next(self.words) >> shift
+            except StopIteration:
+                r = self._refill() >> shift
+            if r < n:
+                return r
+
+    def randint(self, a, b):
+        '''Returns a random int between a and b inclusive'''
+        if a > b:
+            a, b = b, a
+        return a + self.randbelow(b - a + 1)
+
+    def random(self):
+        '''Returns a random float in [0, 1) with 53 random bits'''
+        try:
+            return (next(self.words) >> 11) * _TWO_TO_MINUS_53
+        except StopIteration:
+            return (self._refill() >> 11) * _TWO_TO_MINUS_53
 
     def real_random_number(self, a, b):
-     '''Returns a real random number between a and b'''
-     if a > b:
-        a, b = b, a
-
-     current_time = time.time()
-     milliseconds = int(current_time * 1000) % 1000
-     seconds = int(current_time) % 60
-     minutes = (int(current_time) // 60) % 60
-
-     random_change = (milliseconds + seconds + minutes) % (b - a)
+        '''Returns a real random number between a and b'''
+        if a > b:
+            a, b = b, a
+        return a + (b - a) * self.random()
+
+    def numbers(self, a, b, n):
+        '''Returns a list of n random ints between a and b inclusive'''
+        if a > b:
+            a, b = b, a
+        span = b - a + 1
+        k = (span - 1).bit_length()
+        if k > 64:
+            return [a + self.randbelow(span) for _ in range(n)]
+        width = next(size for size in (1, 2, 4, 8) if 8 * size >= k)
+        code = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[width]
+        mask = (1 << k) - 1
+        result = []
+        while len(result) < n:
+            # Each draw is accepted with probability span / 2**k > 1/2; ask for enough to usually finish in one pass.
+            missing = n - len(result)
+            wanted = missing + missing * ((1 << k) - span) // span + 16
+            view = memoryview(self.randbytes(wanted * width)).cast(code)
+            result.extend(itertools.islice((a + r for r in map(mask.__and__, view) if r < span), missing))
+        return result
 
-     secret = random.uniform(a, b) + (random_change / 1000.0)
-
-     return secret
-    
     def roll(self, sides):
         """Rolls a die with the given number of sides."""
-        result = self.real_random_number(1, sides)
-        return round(result)
+        if not isinstance(sides, int) or sides < 1:
+            raise ValueError("Sides must be a positive integer")
+        return 1 + self.randbelow(sides)
 
-class Terminal():
-    def __init__(self):
-        pass
+class OutputBuffer:
+    '''
+    Accumulates text in memory and writes it to a stream in large chunks.
+    The buffer is flushed once it holds max_bytes characters, when a write happens max_delay
+    seconds or more after the last flush, on flush(), and when used as a context manager, on exit.
+    '''
+    def __init__(self, stream=None, max_bytes=1 << 16, max_delay=0.1):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def write(self, text):
+        '''Adds text to the buffer, flushing it if a threshold is reached'''
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.max_bytes or time.monotonic() - self.last_flush >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        '''Writes everything buffered to the stream in one call'''
+        if self.parts:
+            stream = self.stream or sys.stdout
+            stream.write(''.join(self.parts))
+            stream.flush()
+            self.parts = []
+            self.size = 0
+        self.last_flush = time.monotonic()
+
+class _BatchedOutput:
+    '''
+    Shared print path for Terminal and Console: output goes to self.buffer when one is
+    active, otherwise straight to self.stream (sys.stdout by default)
+    '''
+    def _print(self, text):
+        if self.buffer is not None:
+            self.buffer.write(f"{text}\n")
+        else:
+            print(text, file=self.stream)
+
+    @contextlib.contextmanager
+    def batch(self, max_bytes=1 << 16, max_delay=0.1):
+        '''Context manager that batches all output inside it through an OutputBuffer'''
+        previous = self.buffer
+        self.buffer = OutputBuffer(self.stream, max_bytes, max_delay)
+        try:
+            yield self.buffer
+        finally:
+            self.buffer.flush()
+            self.buffer = previous
+
+    def flush(self):
+        '''Writes out anything held in the active buffer'''
+        if self.buffer is not None:
+            self.buffer.flush()
+
+class Terminal(_BatchedOutput):
+    '''
+    Terminal output helpers, including a double-buffered renderer (draw) that only
+    rewrites the cells that changed since the previous frame. Output can be batched
+    with the batch() context manager, or by setting buffer to an OutputBuffer and
+    calling flush().
+    '''
+    def __init__(self, stream=None, buffer=None):
+        self.stream = stream
+        self.buffer = buffer
+        self.previous = None
+        self.frames_drawn = 0
+        self.bytes_written = 0
+        self.last_frame_bytes = 0
 
     def clear(self):
         '''Clears the terminal screen'''
-        print("\033[H\033[J")
+        self._print("\033[H\033[J")
+        self.previous = None
     
     def clear_terminal(self):
         '''Clears the terminal screen'''
-        print("\033[H\033[J")
+        self._print("\033[H\033[J")
+        self.previous = None
+
+    def _diff_line(self, row, old, new, gap):
+        '''Returns the escape sequences turning line old into line new on the given row'''
+        runs = []
+        for column in range(len(new)):
+            if column < len(old) and old[column] == new[column]:
+                continue
+            if runs and column - runs[-1][1] <= gap:
+                runs[-1][1] = column + 1
+            else:
+                runs.append([column, column + 1])
+        parts = [f"\033[{row + 1};{start + 1}H{new[start:end]}" for start, end in runs]
+        if len(old) > len(new):
+            parts.append(f"\033[{row + 1};{len(new) + 1}H\033[K")
+        return parts
+
+    def draw(self, frame, gap=8):
+        '''
+        Draws a frame (a string or a list of lines) by moving the cursor to each changed
+        run of cells and rewriting only those, all in one write. Runs separated by at most
+        gap unchanged cells are sent as one segment. The first frame clears the screen.
+        Returns the number of bytes written, which is also kept in last_frame_bytes.
+        '''
+        lines = frame.splitlines() if isinstance(frame, str) else [str(line) for line in frame]
+        previous = self.previous
+        parts = []
+        if previous is None:
+            parts.append("\033[H\033[J")
+            previous = []
+        for row, line in enumerate(lines):
+            old = previous[row] if row < len(previous) else ''
+            if line != old:
+                parts.extend(self._diff_line(row, old, line, gap))
+        for row in range(len(lines), len(previous)):
+            if previous[row]:
+                parts.append(f"\033[{row + 1};1H\033[K")
+        self.previous = lines
+        payload = ''.join(parts)
+        if self.buffer is not None:
+            self.buffer.write(payload)
+            self.buffer.flush()
+        else:
+            stream = self.stream or sys.stdout
+            stream.write(payload)
+            stream.flush()
+        self.last_frame_bytes = len(payload.encode('utf-8'))
+        self.bytes_written += self.last_frame_bytes
+        self.frames_drawn += 1
+        return self.last_frame_bytes
+
+    def average_frame_bytes(self):
+        '''Returns the mean number of bytes written per drawn frame'''
+        return self.bytes_written / self.frames_drawn if self.frames_drawn else 0.0
 
     def render_array(self, array):
-        ''' Renders a 2D array to the terminal '''
-        for line in array:
-            print(line)
+        ''' Renders a 2D array to the terminal, batching the lines into large writes '''
+        if self.buffer is not None:
+            for line in array:
+                self._print(line)
+            return
+        with self.batch(max_delay=float('inf')):
+            for line in array:
+                self._print(line)
     
     def update(self, arr):
         """Clears terminal and redraws the array"""
@@ -282,24 +1586,25 @@ class Terminal():
 
     def render(self, ascii):
         ''' Renders ASCII art to the terminal '''
-        print(ascii)
+        self._print(ascii)
 
     def log(self, text):
         ''' Logs text to the console '''
-        print(text)
+        self._print(text)
 
-class Console():
+class Console(_BatchedOutput):
     ''' The Console/Terminal class '''
-    def __init__(self):
-        pass
+    def __init__(self, stream=None, buffer=None):
+        self.stream = stream
+        self.buffer = buffer
 
     def log(self, text):
         ''' Logs text to the console '''
-        print(text)
+        self._print(text)
 
     def clear(self):
         ''' Clears the console '''
-        print("\033[H\033[J")
+        self._print("\033[H\033[J")
 
 def random_quote():
     quotes = [
@@ -398,30 +1703,109 @@ def random_quote():
     ]
     return random.choice(quotes)
 
+_COLOR_CODES = {
+    "red": '\033[31m',
+    "green": '\033[32m',
+    "yellow": '\033[33m',
+    "blue": '\033[34m',
+    "purple": '\033[35m',
+    "cyan": '\033[36m',
+    "white": '\033[37m',
+    "lime": '\033[38;5;118m',
+}
+_BOLD = '\033[1m'
+_RESET = '\033[0m'
+
 def log(text, color="lime"):
     '''Logs text to the console with color'''
-    if color.lower() == "red":
-        print(f"\033[31m{text}\033[0m")
-    elif color.lower() == "green":
-        print(f"\033[32m{text}\033[0m")
-    elif color.lower() == "yellow":
-        print(f"\033[33m{text}\033[0m")
-    elif color.lower() == "blue":
-        print(f"\033[34m{text}\033[0m")
-    elif color.lower() == "purple":
-        print(f"\033[35m{text}\033[0m")
-    elif color.lower() == "cyan":
-        print(f"\033[36m{text}\033[0m")
-    elif color.lower() == "white":
-        print(f"\033[37m{text}\033[0m")
-    elif color.lower() == "lime":
-        print(f"\033[38;5;118m{text}\033[0m")
-    else:
+    code = _COLOR_CODES.get(color.lower())
+    if code is None:
         print(text)
+    else:
+        print(f"{code}{text}{_RESET}")
+
+_PASSWORD_CHARACTERS = (string.ascii_letters + string.digits + string.punctuation).encode()
+_PASSWORD_CLASSES = {
+    'lower': string.ascii_lowercase.encode(),
+    'upper': string.ascii_uppercase.encode(),
+    'digits': string.digits.encode(),
+    'symbols': string.punctuation.encode(),
+}
+# A random byte b below _PASSWORD_LIMIT becomes character b % 94, so every character is equally
+# likely; bytes at or above it are rejected (deleted by bytes.translate).
+_PASSWORD_LIMIT = 256 - 256 % len(_PASSWORD_CHARACTERS)
+_PASSWORD_TABLE = bytes(_PASSWORD_CHARACTERS[b % len(_PASSWORD_CHARACTERS)] for b in range(_PASSWORD_LIMIT)) \
+    + bytes(256 - _PASSWORD_LIMIT)
+_PASSWORD_REJECT = bytes(range(_PASSWORD_LIMIT, 256))
+_password_source = Secret()
+
+@functools.lru_cache(maxsize=64)
+def _policy_acceptance(length, checks):
+    '''
+    Estimates the chance that a uniform random password meets every (class size, minimum)
+    in checks, treating the classes as independent binomials
+    '''
+    chance = 1.0
+    for size, minimum in checks:
+        p = size / len(_PASSWORD_CHARACTERS)
+        chance *= sum(math.comb(length, k) * p ** k * (1 - p) ** (length - k) for k in range(minimum, length + 1))
+    return chance
+
+def _build_password(length, checks):
+    '''Builds one password holding the minimum of each class in checks, filled up at random and shuffled'''
+    randbelow = _password_source.randbelow
+    characters = [members[randbelow(len(members))] for members, minimum in checks for _ in range(minimum)]
+    while len(characters) < length:
+        characters.append(_PASSWORD_CHARACTERS[randbelow(len(_PASSWORD_CHARACTERS))])
+    for i in range(length - 1, 0, -1):
+        j = randbelow(i + 1)
+        characters[i], characters[j] = characters[j], characters[i]
+    return bytes(characters).decode()
+
+def generate_passwords(n, length=8, policy=None, workers=1):
+    '''
+    Returns a list of n passwords of length characters from letters, digits and punctuation,
+    drawn from the cryptographically secure Secret source.
+    policy maps 'lower', 'upper', 'digits' and 'symbols' to minimum counts, e.g. {'digits': 2};
+    passwords missing one are redrawn, so the result is uniform over the passwords that comply.
+    When a random password would rarely comply (strict policies), each password is instead built
+    from the required characters plus random fill and shuffled.
+    workers > 1 splits the work across that many processes.
+    '''
+    policy = policy or {}
+    unknown = set(policy) - set(_PASSWORD_CLASSES)
+    if unknown:
+        raise ValueError(f"Unknown password policy classes: {', '.join(sorted(unknown))}")
+    if sum(policy.values()) > length:
+        raise ValueError("The password policy requires more characters than length")
+    if length <= 0:
+        return [''] * n
+    if workers > 1 and n > 1:
+        import concurrent.futures
+        sizes = [n // workers + (i < n % workers) for i in range(workers)]
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            chunks = executor.map(generate_passwords, sizes, itertools.repeat(length), itertools.repeat(policy))
+            return list(itertools.chain.from_iterable(chunks))
+    checks = [(_PASSWORD_CLASSES[name], minimum) for name, minimum in policy.items() if minimum > 0]
+    if _policy_acceptance(length, tuple((len(members), minimum) for members, minimum in checks)) < 1 / 8:
+        return [_build_password(length, checks) for _ in range(n)]
+    passwords = []
+    while len(passwords) < n:
+        missing = n - len(passwords)
+        # About 73% of random bytes are kept, so ask for 1.5x what is still missing.
+        data = _password_source.randbytes(missing * length * 3 // 2 + length)
+        data = data.translate(_PASSWORD_TABLE, _PASSWORD_REJECT)
+        candidates = (data[i:i + length] for i in range(0, len(data) - length + 1, length))
+        if checks:
+            candidates = (password for password in candidates
+                          if all(length - len(password.translate(None, members)) >= minimum
+                                 for members, minimum in checks))
+        passwords.extend(password.decode() for password in itertools.islice(candidates, missing))
+    return passwords
 
 def generate_password(length=8):
-    characters = string.ascii_letters + string.digits + string.punctuation  
-    return ''.join(random.choice(characters) for _ in range(length))
+    '''Returns a cryptographically secure random password of letters, digits and punctuation'''
+    return generate_passwords(1, length)[0]
 
 def distance(x1, y1, x2, y2):
     '''Returns the distance between two coordinates'''
@@ -431,6 +1815,177 @@ def midpoint(x1, y1, x2, y2):
     '''Returns the midpoint between two coordinates'''
     return ((x1 + x2) / 2, (y1 + y2) / 2)
 
+def _points(points):
+    '''Returns points as an (n, 2) float NumPy array'''
+    if not isinstance(points, (numpy.ndarray, collections.abc.Sequence)):
+        points = list(points)
+    return numpy.asarray(points, dtype=float).reshape(-1, 2)
+
+def _paired(points_a, points_b):
+    '''Returns both point sequences as (n, 2) arrays (or lists without NumPy), checking they have equal length'''
+    if _numpy() is not None:
+        points_a, points_b = _points(points_a), _points(points_b)
+    else:
+        points_a, points_b = list(points_a), list(points_b)
+    if len(points_a) != len(points_b):
+        raise ValueError(f"Point sequences differ in length: {len(points_a)} and {len(points_b)}")
+    return points_a, points_b
+
+def distances(points_a, points_b):
+    '''
+    Returns the distance between points_a[i] and points_b[i] for every i, where points are
+    (x, y) pairs. Computed with NumPy (returning an array) when it is installed.
+    '''
+    points_a, points_b = _paired(points_a, points_b)
+    if _numpy() is not None:
+        delta = points_b - points_a
+        return numpy.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+    return [math.sqrt((x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1))
+            for (x1, y1), (x2, y2) in zip(points_a, points_b)]
+
+def distances_from(point, points):
+    '''Returns the distance from point to each of points (a NumPy array when NumPy is installed)'''
+    x, y = point
+    if _numpy() is not None:
+        delta = _points(points) - (x, y)
+        return numpy.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+    return [math.sqrt((px - x) * (px - x) + (py - y) * (py - y)) for px, py in points]
+
+def distance_matrix(points_a, points_b=None):
+    '''
+    Returns the distances between every point of points_a and every point of points_b
+    (points_a itself by default): a NumPy array of shape (len(a), len(b)) when NumPy is
+    installed, otherwise a list of rows.
+    '''
+    if points_b is None:
+        if not isinstance(points_a, collections.abc.Sequence) and not hasattr(points_a, 'shape'):
+            points_a = list(points_a)
+        points_b = points_a
+    if _numpy() is not None:
+        a = _points(points_a)
+        b = _points(points_b)
+        dx = b[:, 0] - a[:, 0, numpy.newaxis]
+        dy = b[:, 1] - a[:, 1, numpy.newaxis]
+        return numpy.sqrt(dx * dx + dy * dy)
+    points_b = list(points_b)
+    return [distances_from(point, points_b) for point in points_a]
+
+def midpoints(points_a, points_b):
+    '''Returns the midpoint of points_a[i] and points_b[i] for every i (an (n, 2) NumPy array when NumPy is installed)'''
+    points_a, points_b = _paired(points_a, points_b)
+    if _numpy() is not None:
+        return (points_a + points_b) / 2
+    return [((x1 + x2) / 2, (y1 + y2) / 2) for (x1, y1), (x2, y2) in zip(points_a, points_b)]
+
+class SpatialIndex:
+    '''
+    Uniform grid over 2D points for nearest-neighbour and radius queries without scanning every
+    point. Each point is filed under the square cell of side cell_size that contains it; by
+    default cell_size is chosen so that there is about one point per cell.
+    Distances are the same as distance().
+    '''
+    def __init__(self, points=(), cell_size=None):
+        self.points = [(x, y) for x, y in points]
+        if cell_size is None:
+            cell_size = self._cell_size()
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self.cells = collections.defaultdict(list)
+        self.bounds = None
+        for index, (x, y) in enumerate(self.points):
+            self._file(index, x, y)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell_size(self):
+        if len(self.points) < 2:
+            return 1.0
+        xs, ys = zip(*self.points)
+        width = max(xs) - min(xs)
+        height = max(ys) - min(ys)
+        # For long thin point clouds the area-based size would make many tiny cells along the long side.
+        return max(math.sqrt(width * height / len(self.points)), max(width, height) / len(self.points)) or 1.0
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _file(self, index, x, y):
+        cx, cy = self._cell(x, y)
+        self.cells[cx, cy].append(index)
+        if self.bounds is None:
+            self.bounds = [cx, cy, cx, cy]
+        else:
+            bounds = self.bounds
+            bounds[0] = min(bounds[0], cx)
+            bounds[1] = min(bounds[1], cy)
+            bounds[2] = max(bounds[2], cx)
+            bounds[3] = max(bounds[3], cy)
+
+    def add(self, x, y):
+        '''Adds a point and returns its index'''
+        index = len(self.points)
+        self.points.append((x, y))
+        self._file(index, x, y)
+        return index
+
+    def _ring(self, cx, cy, r):
+        '''Yields the occupied cells at Chebyshev distance r from (cx, cy)'''
+        left, bottom, right, top = self.bounds
+        cells = self.cells
+        for gx in range(max(cx - r, left), min(cx + r, right) + 1):
+            if abs(gx - cx) == r:
+                ys = range(max(cy - r, bottom), min(cy + r, top) + 1)
+            else:
+                ys = [gy for gy in (cy - r, cy + r) if bottom <= gy <= top]
+            for gy in ys:
+                cell = cells.get((gx, gy))
+                if cell:
+                    yield cell
+
+    def nearest(self, x, y):
+        '''Returns (index, distance) of the point closest to (x, y), or None if the index is empty'''
+        if not self.points:
+            return None
+        cx, cy = self._cell(x, y)
+        left, bottom, right, top = self.bounds
+        # Rings closer than the occupied area are empty, and rings beyond it hold no points.
+        first = max(left - cx, cx - right, bottom - cy, cy - top, 0)
+        last = max(cx - left, right - cx, cy - bottom, top - cy)
+        best = (math.inf, -1)
+        points = self.points
+        for r in range(first, last + 1):
+            for cell in self._ring(cx, cy, r):
+                for index in cell:
+                    px, py = points[index]
+                    candidate = (math.sqrt((px - x) * (px - x) + (py - y) * (py - y)), index)
+                    if candidate < best:
+                        best = candidate
+            # Any point in ring r + 1 or further out is at least r cells away from (x, y).
+            if best[0] <= r * self.cell_size:
+                break
+        return best[1], best[0]
+
+    def within(self, x, y, radius):
+        '''Returns the indices of the points within radius of (x, y), nearest first'''
+        if not self.points:
+            return []
+        left, bottom = self._cell(x - radius, y - radius)
+        right, top = self._cell(x + radius, y + radius)
+        bounds = self.bounds
+        points = self.points
+        found = []
+        for gx in range(max(left, bounds[0]), min(right, bounds[2]) + 1):
+            for gy in range(max(bottom, bounds[1]), min(top, bounds[3]) + 1):
+                for index in self.cells.get((gx, gy), ()):
+                    px, py = points[index]
+                    d = math.sqrt((px - x) * (px - x) + (py - y) * (py - y))
+                    if d <= radius:
+                        found.append((d, index))
+        found.sort()
+        return [index for d, index in found]
+
 class Printer:
     class Colors:
         RED = '\033[31m'
@@ -443,29 +1998,153 @@ class Printer:
         RESET = '\033[0m'
         YELLOW_GREEN = '\033[38;5;118m'
 
-    def log(self, text, color="lime", bold=False):
-        color_map = {
-            "red": self.Colors.RED,
-            "green": self.Colors.GREEN,
-            "yellow": self.Colors.YELLOW,
-            "blue": self.Colors.BLUE,
-            "purple": self.Colors.PURPLE,
-            "cyan": self.Colors.CYAN,
-            "white": self.Colors.WHITE,
-            "lime": self.Colors.YELLOW_GREEN,
-        }
+    color_map = _COLOR_CODES
 
-        color_code = color_map.get(color.lower(), "")
-        bold_code = "\033[1m" if bold else ""
+    def log(self, text, color="lime", bold=False):
+        color_code = self.color_map.get(color.lower(), "")
+        bold_code = _BOLD if bold else ""
         
         print(f"{bold_code}{color_code}{text}{self.Colors.RESET}")
 
+_open_loggers = weakref.WeakSet()
+
+@atexit.register
+def _close_loggers():
+    '''Closes every Logger still open at interpreter exit so queued records are written'''
+    for logger in list(_open_loggers):
+        logger.close()
+
+class Logger:
+    '''
+    Non-blocking colored logger. log() only enqueues a record; a background thread
+    formats records and writes them to the stream in batches.
+    When the queue holds max_queue records, policy "block" makes log() wait for room
+    and policy "drop" discards the record (counted in dropped). A batch the stream fails to
+    write is counted in errors and skipped. Loggers still open at interpreter exit are closed
+    then, so queued records are written.
+    '''
+    def __init__(self, stream=None, color="lime", max_queue=10000, policy="block", batch=256):
+        if policy not in ("block", "drop"):
+            raise ValueError("policy must be 'block' or 'drop'")
+        self.stream = stream
+        self.color = color.lower()
+        self.policy = policy
+        self.batch = batch
+        self.prefixes = {}
+        for name, code in _COLOR_CODES.items():
+            self.prefixes[name, False] = code
+            self.prefixes[name, True] = _BOLD + code
+        self.queue = queue.Queue(max_queue)
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        # Held while checking closed and enqueueing, so nothing can be queued behind close()'s sentinel.
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.closed = False
+        self.thread = threading.Thread(target=self._writer, name="foundation-logger", daemon=True)
+        self.thread.start()
+        _open_loggers.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _prefix(self, color, bold):
+        if color is None:
+            color = self.color
+        prefix = self.prefixes.get((color, bold))
+        if prefix is None:
+            prefix = self.prefixes.get((color.lower(), bold), _BOLD if bold else "")
+            self.prefixes[color, bold] = prefix
+        return prefix
+
+    def log(self, text, color=None, bold=False):
+        '''Queues text for writing; returns False if it was dropped'''
+        record = (self._prefix(color, bold), text)
+        with self.lock:
+            if self.closed:
+                raise ValueError("log on closed Logger")
+            if self.policy == "drop":
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+            else:
+                self.queue.put(record)
+            self.enqueued += 1
+        return True
+
+    def _writer(self):
+        get = self.queue.get
+        while True:
+            records = [get()]
+            while len(records) < self.batch:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            count = len(records)
+            done = None in records
+            if done:
+                records = [record for record in records if record is not None]
+            if records:
+                try:
+                    stream = self.stream or sys.stdout
+                    stream.write(''.join(f"{prefix}{text}{_RESET}\n" for prefix, text in records))
+                    stream.flush()
+                    self.written += len(records)
+                except Exception:
+                    self.errors += 1
+            for _ in range(count):
+                self.queue.task_done()
+            if done:
+                return
+
+    def flush(self):
+        '''Blocks until every queued record has been written'''
+        self.queue.join()
+
+    def close(self):
+        '''Writes any queued records and stops the writer thread'''
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join()
+        _open_loggers.discard(self)
+
+    def queue_depth(self):
+        '''Returns the number of records waiting to be written'''
+        return self.queue.qsize()
+
+    def throughput(self):
+        '''Returns records written per second since the logger was created'''
+        elapsed = time.perf_counter() - self.started
+        return self.written / elapsed if elapsed else 0.0
+
+    def stats(self):
+        '''Returns the logger counters as a dict'''
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth(),
+            "throughput": self.throughput(),
+        }
+
 class View:
     def __init__(self, title, width, height):
         self.title = title
         self.width = width
         self.height = height
-        self.window = tkinter.Tk()
+        self.window = _tkinter().Tk()
         self.window.title(title)
         self.window.geometry(f"{width}x{height}")
         self.window.resizable(False, False)
@@ -474,7 +2153,7 @@ class View:
         self.window.mainloop()
 
     def button(self, text, command):
-        button = tkinter.Button(self.window, text=text, command=command)
+        button = _tkinter().Button(self.window, text=text, command=command)
         button.config(font=("Arial", 12), padx=20, pady=10)
         button.pack_propagate(False)
         button.config(borderwidth=0, relief="flat")
@@ -482,33 +2161,253 @@ class View:
         button.pack()
     
     def text(self, text):
-        label = tkinter.Label(self.window, text=text, font=("Arial", 12))
+        label = _tkinter().Label(self.window, text=text, font=("Arial", 12))
         label.pack()
     
     def spacer(self):
-        label = tkinter.Label(self.window, text="")
+        label = _tkinter().Label(self.window, text="")
         label.pack()
 
     def paragraph(self, text):
-        label = tkinter.Label(self.window, text=text, font=("Arial", 10), wraplength=self.width, justify="left")
+        label = _tkinter().Label(self.window, text=text, font=("Arial", 10), wraplength=self.width, justify="left")
         label.pack()
 
     def heading(self, text):
-        label = tkinter.Label(self.window, text=text, font=("Arial", 15))
+        label = _tkinter().Label(self.window, text=text, font=("Arial", 15))
         label.pack()
 
     def input(self, placeholder):
-        entry = tkinter.Entry(self.window, font=("Arial", 12), width=30)
+        entry = _tkinter().Entry(self.window, font=("Arial", 12), width=30)
         entry.insert(0, placeholder)
         entry.pack()
         return entry
 
 
+_TTT_LINES = (0b000000111, 0b000111000, 0b111000000,
+              0b001001001, 0b010010010, 0b100100100,
+              0b100010001, 0b001010100)
+
+@functools.lru_cache(maxsize=None)
+def _ttt_wins():
+    '''Returns a table whose entry for a 9-bit mask is true when the mask contains a full line'''
+    return bytes(any(mask & line == line for line in _TTT_LINES) for mask in range(512))
+
+@functools.lru_cache(maxsize=None)
+def _ttt_counts():
+    '''Returns a table of the number of marks in each 9-bit mask'''
+    return bytes(bin(mask).count('1') for mask in range(512))
+
+@functools.lru_cache(maxsize=None)
+def _ttt_symmetries():
+    '''
+    Returns the 8 rotations/reflections of the 3x3 board, each as a table mapping a 9-bit mask
+    to its transformed mask
+    '''
+    transforms = (lambda r, c: (r, c), lambda r, c: (c, 2 - r), lambda r, c: (2 - r, 2 - c),
+                  lambda r, c: (2 - c, r), lambda r, c: (r, 2 - c), lambda r, c: (2 - r, c),
+                  lambda r, c: (c, r), lambda r, c: (2 - c, 2 - r))
+    tables = []
+    for transform in transforms:
+        cells = [3 * r + c for r, c in (transform(i // 3, i % 3) for i in range(9))]
+        tables.append([sum(1 << cells[i] for i in range(9) if mask >> i & 1) for mask in range(512)])
+    return tuple(tables)
+
+class TicTacToeSolver:
+    '''
+    Alpha-beta tic-tac-toe solver. The board is encoded as bitmasks (the side to move, the other
+    side, and cells held by any other mark) and wins are looked up in a precomputed table.
+    Searched positions are stored in a transposition table keyed by the canonical form of the
+    board under its 8 symmetries; the table is shared by every solver and every TicTacToe game.
+    Scores match TicTacToe.minimax: faster wins score higher and slower losses score higher.
+    '''
+    EXACT, LOWER, UPPER = 0, 1, 2
+    table = {}
+    moves = {}
+
+    # The lookup tables are built on first use so that importing the module stays cheap.
+    @functools.cached_property
+    def wins(self):
+        return _ttt_wins()
+
+    @functools.cached_property
+    def counts(self):
+        return _ttt_counts()
+
+    @functools.cached_property
+    def symmetries(self):
+        return _ttt_symmetries()
+
+    def encode(self, board, player, opponent):
+        '''Returns (player mask, opponent mask, blocked mask) for a list-of-strings board'''
+        mine = theirs = blocked = 0
+        for i, cell in enumerate(board):
+            if cell == player:
+                mine |= 1 << i
+            elif cell == opponent:
+                theirs |= 1 << i
+            elif cell != ' ':
+                blocked |= 1 << i
+        return mine, theirs, blocked
+
+    def key(self, me, opp, blocked):
+        '''Returns the canonical transposition-table key of a position'''
+        return min(s[me] | s[opp] << 9 | s[blocked] << 18 for s in self.symmetries)
+
+    def search(self, me, opp, blocked, alpha=-100, beta=100):
+        '''
+        Returns the negamax score of the position for the side to move (me). The result is exact
+        when it lies strictly inside (alpha, beta), otherwise it is a bound on the far side.
+        '''
+        filled = self.counts[me | opp | blocked]
+        wins = self.wins
+        if wins[opp]:
+            return filled - 10
+        if wins[me]:
+            return 10 - filled
+        empty = ~(me | opp | blocked) & 0x1FF
+        if not empty:
+            return 0
+        key = self.key(me, opp, blocked)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == self.EXACT or (flag == self.LOWER and value >= beta) or (flag == self.UPPER and value <= alpha):
+                return value
+        start = alpha
+        best = -100
+        while empty:
+            bit = empty & -empty
+            empty ^= bit
+            value = -self.search(opp, me | bit, blocked, -beta, -alpha)
+            if value > best:
+                best = value
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+        flag = self.UPPER if best <= start else self.LOWER if best >= beta else self.EXACT
+        self.table[key] = (best, flag)
+        return best
+
+    def best_move(self, board, player, opponent):
+        '''
+        Returns the best cell for player on board, or -1 if the board is full.
+        Ties go to the lowest index, as in TicTacToe.best_move.
+        '''
+        return self.choose(*self.encode(board, player, opponent))
+
+    def choose(self, me, opp, blocked=0):
+        '''Returns the best cell for the side holding me, or -1 if no cell is free'''
+        cached = self.moves.get((me, opp, blocked))
+        if cached is not None:
+            return cached
+        best = -100
+        move = -1
+        for i in range(9):
+            bit = 1 << i
+            if (me | opp | blocked) & bit:
+                continue
+            score = -self.search(opp, me | bit, blocked, -100, -best)
+            if score > best:
+                best = score
+                move = i
+        self.moves[me, opp, blocked] = move
+        return move
+
+_POLICY_MAGIC = b'FNDTTT1\n'
+_POLICY_SIZE = 3 ** 9
+
+class TicTacToePolicy:
+    '''
+    The optimal move for every 3x3 position, so choosing a move is one array lookup.
+    A position is indexed in base 3, cell i contributing 3**i times 0 (empty), 1 (the player
+    to move) or 2 (the opponent); the entry is the cell to play, or 255 when the board is full.
+    shared() builds the table once per process on first use; save and load keep it in a small file.
+    '''
+    _shared = None
+    _lock = threading.Lock()
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else self.build()
+        self.solver = TicTacToeSolver()
+
+    @classmethod
+    def shared(cls):
+        '''Returns the process-wide policy, building it on first use'''
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @staticmethod
+    def build(solver=None):
+        '''Solves every position and returns the table as bytes'''
+        solver = solver or TicTacToeSolver()
+        table = bytearray(_POLICY_SIZE)
+        for index in range(_POLICY_SIZE):
+            me = opp = 0
+            digits = index
+            for i in range(9):
+                digits, digit = divmod(digits, 3)
+                if digit == 1:
+                    me |= 1 << i
+                elif digit == 2:
+                    opp |= 1 << i
+            table[index] = solver.choose(me, opp) & 255
+        return bytes(table)
+
+    def index(self, board, player, opponent):
+        '''Returns the table index of board, or None when it holds marks other than the two players'''
+        if len(board) != 9:
+            return None
+        index = 0
+        for cell in reversed(board):
+            if cell == ' ':
+                index *= 3
+            elif cell == player:
+                index = index * 3 + 1
+            elif cell == opponent:
+                index = index * 3 + 2
+            else:
+                return None
+        return index
+
+    def best_move(self, board, player, opponent):
+        '''Returns the best cell for player on board, or -1 if the board is full'''
+        index = self.index(board, player, opponent)
+        if index is None:
+            return self.solver.best_move(board, player, opponent)
+        move = self.table[index]
+        return -1 if move == 255 else move
+
+    def save(self, path):
+        '''Writes the table to path'''
+        with open(path, 'wb') as handle:
+            handle.write(_POLICY_MAGIC)
+            handle.write(self.table)
+
+    @classmethod
+    def load(cls, path):
+        '''Reads a table written by save'''
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        if data[:len(_POLICY_MAGIC)] != _POLICY_MAGIC or len(data) != len(_POLICY_MAGIC) + _POLICY_SIZE:
+            raise ValueError("Not a TicTacToePolicy file")
+        return cls(data[len(_POLICY_MAGIC):])
+
 class TicTacToe:
     '''This class implements a console-based Tic-Tac-Toe game with an AI that plays optimally using the minimax algorithm.'''
 
-    def __init__(self, player='X'):
-        '''Initializes the game with an empty board and sets the player character.'''
+    solver = TicTacToeSolver()
+
+    def __init__(self, player='X', policy=None):
+        '''
+        Initializes the game with an empty board and sets the player character.
+        policy=True looks moves up in the shared precomputed TicTacToePolicy instead of searching;
+        a TicTacToePolicy instance (e.g. from TicTacToePolicy.load) can be passed as well.
+        '''
+        self.policy = TicTacToePolicy.shared() if policy is True else policy or None
         self.board = [' ' for _ in range(9)]
         self.human_player = player
         self.ai_player = 'O' if player == 'X' else 'X'
@@ -544,7 +2443,7 @@ class TicTacToe:
 
         if is_maximizing:
             best_score = float('-inf')
-            for i in range(9):
+            for i in range(len(board)):
                 if board[i] == ' ':
                     board[i] = self.ai_player
                     score = self.minimax(board, depth + 1, False)
@@ -553,7 +2452,7 @@ class TicTacToe:
             return best_score
         else:
             best_score = float('inf')
-            for i in range(9):
+            for i in range(len(board)):
                 if board[i] == ' ':
                     board[i] = self.human_player
                     score = self.minimax(board, depth + 1, True)
@@ -562,39 +2461,18 @@ class TicTacToe:
             return best_score
 
     def best_move(self):
-        '''Calculates the best move for the AI using the minimax algorithm.'''
-        best_score = float('-inf')
-        move = -1
-        for i in range(9):
-            if self.board[i] == ' ':
-                self.board[i] = self.ai_player
-                score = self.minimax(self.board, 0, False)
-                self.board[i] = ' '
-                if score > best_score:
-                    best_score = score
-                    move = i
-        return move
+        '''Calculates the best move for the AI with the shared alpha-beta solver.'''
+        return (self.policy or self.solver).best_move(self.board, self.ai_player, self.human_player)
 
     def get_best_move(self, board, ai_player='O', human_player='X'):
         '''Method to return the best move for the AI given a board state.'''
         self.ai_player = ai_player
         self.human_player = human_player
-        temp_board = board.copy()
-        best_score = float('-inf')
-        move = -1
-        for i in range(9):
-            if temp_board[i] == ' ':
-                temp_board[i] = ai_player
-                score = self.minimax(temp_board, 0, False)
-                temp_board[i] = ' '
-                if score > best_score:
-                    best_score = score
-                    move = i
-        return move
+        return (self.policy or self.solver).best_move(board, ai_player, human_player)
 
     def play_move(self, position):
         '''Marks the board with the current player's move.'''
-        if 0 <= position < 9 and self.board[position] == ' ':
+        if 0 <= position < len(self.board) and self.board[position] == ' ':
             self.board[position] = self.current_player
             return True
         return False
@@ -613,12 +2491,12 @@ class TicTacToe:
                 self.play_move(move)
             else:
                 try:
-                    move = int(input(f"Your turn ({self.human_player}). Enter a position (0-8): "))
+                    move = int(input(f"Your turn ({self.human_player}). Enter a position (0-{len(self.board) - 1}): "))
                     if not self.play_move(move):
                         print("Invalid move. Try again.")
                         continue
                 except (ValueError, IndexError):
-                    print("Enter a number between 0 and 8. Try again.")
+                    print(f"Enter a number between 0 and {len(self.board) - 1}. Try again.")
                     continue
 
             self.print_board()
@@ -631,47 +2509,279 @@ class TicTacToe:
             self.switch_player()
         print("It's a draw!")
 
+class _SearchTimeout(Exception):
+    '''Raised inside KInARow search when the per-move time budget runs out'''
+
+class KInARow(TicTacToe):
+    '''
+    Tic-Tac-Toe on a size x size board where k marks in a row (horizontally, vertically or
+    diagonally) win, e.g. KInARow(4), KInARow(5, 4) or Gomoku as KInARow(15, 5).
+    The AI runs alpha-beta search with move ordering and a transposition table, deepening one ply
+    at a time until time_limit seconds have passed (or max_depth is reached), and scores the
+    positions where it stops with a heuristic that rewards open lines.
+    '''
+    WIN = 1 << 40
+
+    def __init__(self, size=4, k=None, player='X', time_limit=1.0, max_depth=None):
+        super().__init__(player)
+        self.size = size
+        self.k = k or size
+        if not 1 <= self.k <= size:
+            raise ValueError("k must be between 1 and size")
+        self.board = [' '] * (size * size)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.lines = self._lines()
+        self.cell_lines = [[line for line in self.lines if line >> i & 1] for i in range(size * size)]
+        # Cells on more lines are tried first; a stone in k - 1 of a line is worth 8**(k-1).
+        self.order = sorted(range(size * size), key=lambda i: -len(self.cell_lines[i]))
+        self.weights = [0] + [8 ** count for count in range(1, self.k + 1)]
+        self.neighbours = self._neighbours()
+        self.full = (1 << (size * size)) - 1
+        self.table = {}
+        self.deadline = 0
+        self.nodes = 0
+        self.depth_reached = 0
+
+    def _lines(self):
+        '''Returns a bitmask for every run of k cells'''
+        size, k = self.size, self.k
+        lines = []
+        for row in range(size):
+            for col in range(size):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row, end_col = row + dr * (k - 1), col + dc * (k - 1)
+                    if 0 <= end_row < size and 0 <= end_col < size:
+                        lines.append(sum(1 << ((row + dr * i) * size + col + dc * i) for i in range(k)))
+        return lines
+
+    def _neighbours(self):
+        '''Returns, for every cell, a mask of the cells within two steps of it'''
+        size = self.size
+        masks = []
+        for i in range(size * size):
+            row, col = divmod(i, size)
+            masks.append(sum(1 << (r * size + c)
+                             for r in range(max(row - 2, 0), min(row + 3, size))
+                             for c in range(max(col - 2, 0), min(col + 3, size))))
+        return masks
+
+    def print_board(self):
+        '''Displays the current state of the board in a human-readable format.'''
+        rows = [' | '.join(self.board[i:i + self.size]) for i in range(0, len(self.board), self.size)]
+        print('\n' + ('\n' + '+'.join(['--'] + ['---'] * (self.size - 2) + ['--']) + '\n').join(rows) + '\n')
+
+    def _mask(self, board, player):
+        return sum(1 << i for i, cell in enumerate(board) if cell == player)
+
+    def is_winner(self, board, player):
+        '''Checks if a given player has k in a row on the provided board.'''
+        mask = self._mask(board, player)
+        return any(mask & line == line for line in self.lines)
+
+    def evaluate(self, me, opp):
+        '''Heuristic score for the side holding me: lines only one side can still complete, weighted by how full they are'''
+        weights = self.weights
+        score = 0
+        for line in self.lines:
+            mine = me & line
+            theirs = opp & line
+            if mine and not theirs:
+                score += weights[bin(mine).count('1')]
+            elif theirs and not mine:
+                score -= weights[bin(theirs).count('1')]
+        return score
+
+    def _gain(self, me, opp, move):
+        '''Change in evaluate(me, opp) when the side holding me plays move'''
+        weights = self.weights
+        gain = 0
+        for line in self.cell_lines[move]:
+            theirs = opp & line
+            mine = me & line
+            if theirs:
+                if not mine:
+                    gain += weights[bin(theirs).count('1')]
+            else:
+                count = bin(mine).count('1')
+                gain += weights[count + 1] - weights[count]
+        return gain
+
+    def _moves(self, me, opp, first):
+        '''Empty cells near existing marks, best candidates first'''
+        taken = me | opp
+        if not taken:
+            return [self.order[0]]
+        near = 0
+        bits = taken
+        while bits:
+            low = bits & -bits
+            near |= self.neighbours[low.bit_length() - 1]
+            bits ^= low
+        moves = [i for i in self.order if near >> i & 1 and not taken >> i & 1]
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _to_table(self, value, ply):
+        '''
+        Win and loss scores count plies from the search root; the table stores them counted from
+        the position itself, so entries stay valid when a later search starts from another root.
+        '''
+        if value >= self.WIN - len(self.board):
+            return value + ply
+        if value <= len(self.board) - self.WIN:
+            return value - ply
+        return value
+
+    def _from_table(self, value, ply):
+        '''Inverse of _to_table for a position ply plies below the current root'''
+        if value >= self.WIN - len(self.board):
+            return value - ply
+        if value <= len(self.board) - self.WIN:
+            return value + ply
+        return value
+
+    def _search(self, me, opp, last, score, depth, alpha, beta, ply):
+        '''
+        Negamax with alpha-beta; returns the score for the side holding me.
+        score is evaluate(me, opp), kept up to date move by move with _gain.
+        '''
+        self.nodes += 1
+        if self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise _SearchTimeout
+        if any(opp & line == line for line in self.cell_lines[last]):
+            return ply - self.WIN
+        if me | opp == self.full:
+            return 0
+        if depth == 0:
+            return score
+        entry = self.table.get((me, opp))
+        first = None
+        if entry is not None:
+            entry_depth, value, flag, first = entry
+            value = self._from_table(value, ply)
+            if entry_depth >= depth and (flag == TicTacToeSolver.EXACT
+                                         or (flag == TicTacToeSolver.LOWER and value >= beta)
+                                         or (flag == TicTacToeSolver.UPPER and value <= alpha)):
+                return value
+        start = alpha
+        best = -self.WIN - 1
+        best_move = None
+        for move in self._moves(me, opp, first):
+            child = -score - self._gain(me, opp, move)
+            value = -self._search(opp, me | 1 << move, move, child, depth - 1, -beta, -alpha, ply + 1)
+            if value > best:
+                best = value
+                best_move = move
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+        flag = (TicTacToeSolver.UPPER if best <= start
+                else TicTacToeSolver.LOWER if best >= beta else TicTacToeSolver.EXACT)
+        self.table[me, opp] = (depth, self._to_table(best, ply), flag, best_move)
+        return best
+
+    def _root(self, me, opp, depth, moves):
+        '''Searches every root move to depth; returns (best move, score) and puts the best move first in moves'''
+        alpha = -self.WIN - 1
+        best_move = moves[0]
+        score = self.evaluate(me, opp)
+        for move in moves:
+            child = -score - self._gain(me, opp, move)
+            value = -self._search(opp, me | 1 << move, move, child, depth - 1, -self.WIN - 1, -alpha, 1)
+            if value > alpha:
+                alpha = value
+                best_move = move
+        moves.remove(best_move)
+        moves.insert(0, best_move)
+        return best_move, alpha
+
+    def search(self, board, player, opponent):
+        '''Returns the best cell for player found within time_limit, or -1 if the board is full'''
+        me = self._mask(board, player)
+        opp = self._mask(board, opponent)
+        free = [i for i in self.order if board[i] == ' ']
+        if not free:
+            return -1
+        moves = [i for i in self._moves(me, opp, None) if board[i] == ' '] or free
+        self.deadline = time.perf_counter() + self.time_limit
+        self.nodes = 0
+        if len(self.table) > 1 << 20:
+            self.table.clear()
+        best_move = moves[0]
+        max_depth = min(self.max_depth or len(free), len(free))
+        for depth in range(1, max_depth + 1):
+            try:
+                best_move, score = self._root(me, opp, depth, moves)
+            except _SearchTimeout:
+                break
+            self.depth_reached = depth
+            if abs(score) >= self.WIN - len(board):
+                break
+        return best_move
+
+    def best_move(self):
+        '''Calculates the best move for the AI with iterative-deepening alpha-beta search.'''
+        return self.search(self.board, self.ai_player, self.human_player)
+
+    def get_best_move(self, board, ai_player='O', human_player='X'):
+        '''Method to return the best move for the AI given a board state.'''
+        self.ai_player = ai_player
+        self.human_player = human_player
+        return self.search(board, ai_player, human_player)
+
 def msgbox(title, message):
     '''Displays a message box with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     tkinter.messagebox.showinfo(title, message)
 
 def popup(title, message):
     '''Displays a popup message with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     tkinter.messagebox.showinfo(title, message)
 
 def alert(title, message):
     '''Displays an alert with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     tkinter.messagebox.showwarning(title, message)
 
 def confirm(title, message):
     '''Displays a confirmation dialog with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     return tkinter.messagebox.askyesno(title, message)
 
 def prompt(title, message):
     '''Displays a prompt dialog with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     return tkinter.simpledialog.askstring(title, message)
 
 def prompt_number(title, message):
     '''Displays a prompt dialog for a number with the given title and message'''
+    tkinter = _tkinter()
     root = tkinter.Tk()
     root.withdraw()
     return tkinter.simpledialog.askinteger(title, message)
 
-Printer().log("Welcome to AGGM Foundation!", "red", True)
-
-Printer().log("AGGM Foundation ads many functions to python!", "green", True)
+def banner():
+    '''Prints the AGGM Foundation welcome banner'''
+    Printer().log("Welcome to AGGM Foundation!", "red", True)
+    Printer().log("AGGM Foundation ads many functions to python!", "green", True)
 
 if __name__ == '__main__':
+    banner()
     print("Current Time:", current_time())
     print("Current Date:", current_date())
    